@@ -0,0 +1,30 @@
+"""add data_version
+
+Revision ID: 3f1c2a9e7b54
+Revises: d87beb3235ad
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9e7b54'
+down_revision = 'd87beb3235ad'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('data_version',
+    sa.Column('table_name', sa.String(length=64), nullable=False, comment='表名'),
+    sa.Column('teacher_id', sa.String(length=255), nullable=False, comment='教工号'),
+    sa.Column('version', sa.Integer(), nullable=False, comment='版本号'),
+    sa.Column('updated_at', sa.DateTime(), nullable=False, comment='最后修改时间'),
+    sa.PrimaryKeyConstraint('table_name', 'teacher_id')
+    )
+
+
+def downgrade():
+    op.drop_table('data_version')
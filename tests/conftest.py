@@ -0,0 +1,33 @@
+import pytest
+from flask import Flask
+
+from version_four.Config import Config
+from version_four.database import db
+from version_four.models import TeacherInformation, UndergraduateWorkloadTeacherRanking
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """返回一个函数：按给定配置创建使用临时 SQLite 数据库的应用，建好表并登记教师 T0"""
+    contexts = []
+
+    def make_app(**config):
+        # 实例目录也放在临时目录，测试不会在工程里留下数据库文件
+        app = Flask(__name__, instance_path=str(tmp_path))
+        app.config.from_object(Config)
+        app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///%s' % (tmp_path / 'test.db'))
+        app.config.update(config)
+        db.init_app(app)
+        context = app.app_context()
+        context.push()
+        contexts.append(context)
+        db.create_all()
+        db.session.add(TeacherInformation(teacher_id='T0', teacher_name='教师0', password_hash='x'))
+        db.session.add(UndergraduateWorkloadTeacherRanking(teacher_id='T0', teacher_name='教师0'))
+        db.session.commit()
+        return app
+
+    yield make_app
+    for context in reversed(contexts):
+        db.session.remove()
+        context.pop()
@@ -0,0 +1,26 @@
+# 按主键批量写入
+import pytest
+
+from version_four.database import db
+from version_four.models import UndergraduateThesi, verify_rankings
+from version_four.upload_page import bulk_import
+
+
+def thesis_record(student_id, topic='t'):
+    return {"学生姓名": "a", "学生学号": student_id, "学院": "c", "专业": "m", "专业号": "1", "年级": "2020",
+            "毕业论文题目": topic, "毕业论文成绩": "90", "毕业论文指导老师": "教师0", "毕业论文指导老师工号": "T0"}
+
+
+@pytest.mark.parametrize('native', [True, False])
+def test_stream_upsert(make_app, monkeypatch, native):
+    make_app()
+    if not native:
+        # 不支持 upsert 语句的数据库
+        monkeypatch.setattr(bulk_import, 'upsert_statement', lambda table, fields: None)
+    bulk_import.stream_upsert('undergraduate_thesis', [[thesis_record('s1'), thesis_record('s2')]])
+    counts = bulk_import.stream_upsert('undergraduate_thesis',
+                                       [[thesis_record('s1'), thesis_record('s2', 'new'), thesis_record('s3')]])
+    assert counts == {'inserted': 1, 'updated': 1, 'unchanged': 1}
+    assert db.session.get(UndergraduateThesi, 's2').thesis_topic == 'new'
+    assert UndergraduateThesi.query.count() == 3
+    assert verify_rankings(db.session.connection()) == []
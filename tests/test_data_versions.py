@@ -0,0 +1,35 @@
+# 数据版本：按教师和整张表判断数据是否变化
+from version_four.conditional import data_versions
+from version_four.database import db
+from version_four.models import DataVersion, TeacherInformation, UndergraduateThesi, mark_rankings_changed
+
+THESIS = UndergraduateThesi.__tablename__
+
+
+def add_thesis(student_id, teacher_id):
+    db.session.add(UndergraduateThesi(student_name='a', student_id=student_id, teacher_name='x', teacher_id=teacher_id))
+    db.session.commit()
+
+
+def test_teacher_and_table_versions(make_app):
+    make_app()
+    db.session.add(TeacherInformation(teacher_id='T1', teacher_name='教师1', password_hash='x'))
+    db.session.commit()
+    add_thesis('s1', 'T0')
+    teacher, _ = data_versions([THESIS], 'T0')
+    table, _ = data_versions([THESIS])
+    add_thesis('s2', 'T1')
+    # 别的教师的写入不影响这位教师的版本，整张表的版本变化
+    assert data_versions([THESIS], 'T0')[0] == teacher
+    assert data_versions([THESIS])[0] != table
+    # 整张表的版本由各教师的行求和，不单独维护一行
+    assert db.session.get(DataVersion, (THESIS, '*')) is None
+
+
+def test_recompute_all_changes_every_version(make_app):
+    make_app()
+    ranking = 'undergraduate_workload_teacher_ranking'
+    before = data_versions([ranking], 'T9')[0]
+    mark_rankings_changed(db.session, None)
+    db.session.commit()
+    assert data_versions([ranking], 'T9')[0] != before
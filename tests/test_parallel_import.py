@@ -0,0 +1,42 @@
+# 多表并行导入的试导入（diff）路径
+import pandas as pd
+import pytest
+
+from version_four.models import UndergraduateThesi
+from version_four.upload_page.upload_page_bp import import_workbook
+
+
+def thesis(count, teacher_id='T0'):
+    return pd.DataFrame([{"学生姓名": "a", "学生学号": "s%d" % i, "学院": "c", "专业": "m", "专业号": "1",
+                          "年级": "2020", "毕业论文题目": "t", "毕业论文成绩": "90", "毕业论文指导老师": "x",
+                          "毕业论文指导老师工号": teacher_id} for i in range(count)])
+
+
+def internship(count, teacher_id='T0'):
+    return pd.DataFrame([{"学生姓名": "a", "学生学号": "s%d" % i, "专业": "m", "年级": "2020",
+                          "学部内实习指导教师": "x", "学部内实习指导教师工号": teacher_id, "实习周数": 4}
+                         for i in range(count)])
+
+
+@pytest.fixture
+def app(make_app):
+    # 机器只有一个核时也走进程池
+    return make_app(IMPORT_PARSE_WORKERS=2, IMPORT_CHUNK_SIZE=20, IMPORT_DIFF_LIMIT=30)
+
+
+def test_parallel_diff(app, tmp_path):
+    workbook = tmp_path / 'workbook.xlsx'
+    with pd.ExcelWriter(workbook) as writer:
+        thesis(50).to_excel(writer, sheet_name='毕业论文', index=False)
+        internship(10).to_excel(writer, sheet_name='本科实习', index=False)
+
+    results, skipped = import_workbook(str(workbook), 'diff')
+
+    assert skipped == []
+    assert results['undergraduate_thesis']['inserted'] == 50
+    assert results['department_internship']['inserted'] == 10
+    # 明细按 IMPORT_DIFF_LIMIT 截断，跨块合并后也不超过
+    assert len(results['undergraduate_thesis']['changes']) == 30
+    assert len(results['department_internship']['changes']) == 10
+    # 试导入不写库
+    assert UndergraduateThesi.query.count() == 0
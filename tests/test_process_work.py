@@ -0,0 +1,43 @@
+# 逐行导入：任何一行失败则整个上传回滚
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from version_four.database import db
+from version_four.models import UndergraduateThesi, deferred_rankings, verify_rankings
+from version_four.upload_page.upload_page_bp import process_work
+
+
+def thesis_record(student_id):
+    return {"学生姓名": "a", "学生学号": student_id, "学院": "c", "专业": "m", "专业号": "1", "年级": "2020",
+            "毕业论文题目": "t", "毕业论文成绩": "90", "毕业论文指导老师": "教师0", "毕业论文指导老师工号": "T0"}
+
+
+def test_failed_row_rolls_back_whole_upload(make_app):
+    make_app()
+    records = [thesis_record('s1'), thesis_record('s2'), thesis_record('s1')]
+    with pytest.raises(IntegrityError):
+        process_work('undergraduate_thesis', records)
+    assert UndergraduateThesi.query.count() == 0
+    assert verify_rankings(db.session.connection()) == []
+
+
+def test_rows_commit_with_rankings(make_app):
+    make_app()
+    process_work('undergraduate_thesis', [thesis_record('s1'), thesis_record('s2')])
+    db.session.rollback()
+    assert UndergraduateThesi.query.count() == 2
+    assert verify_rankings(db.session.connection()) == []
+
+
+def test_failed_final_flush_rolls_back(make_app):
+    make_app()
+    with pytest.raises(IntegrityError):
+        with deferred_rankings():
+            db.session.add(UndergraduateThesi(student_name='a', student_id='s1', teacher_id='T0'))
+            db.session.flush()
+            db.session.expunge_all()
+            # 留到退出时才 flush 的记录主键重复
+            db.session.add(UndergraduateThesi(student_name='a', student_id='s1', teacher_id='T0'))
+    # 会话已经回滚，可以继续使用
+    assert UndergraduateThesi.query.count() == 0
+    assert verify_rankings(db.session.connection()) == []
@@ -0,0 +1,37 @@
+# 分析页面的排名缓存：按数据版本判断缓存是否过期
+import version_four.models as models
+from version_four.analyse_page.analyse_page_bp import ranking_rows
+from version_four.database import db
+from version_four.models import UndergraduateThesi
+from version_four.ranking_cache import RankingCache
+import version_four.ranking_cache as ranking_cache
+
+
+def add_thesis(student_id):
+    db.session.add(UndergraduateThesi(student_name='a', student_id=student_id, teacher_name='教师0',
+                                      teacher_id='T0'))
+    db.session.commit()
+
+
+def test_cache_hit_until_data_changes(make_app, monkeypatch):
+    make_app()
+    cache = RankingCache(16)
+    monkeypatch.setattr(ranking_cache, '_local', cache)
+    first = ranking_rows('T0')
+    assert ranking_rows('T0') == first
+    assert cache.stats()['hits'] == 1
+    # 其他进程提交的写入不会删除本进程的缓存，但数据版本变了
+    monkeypatch.setattr(models, 'invalidate_rankings', lambda teacher_ids: None)
+    add_thesis('s1')
+    assert ranking_rows('T0')[0][3] == 1
+    assert cache.stats()['misses'] == 2
+
+
+def test_commit_invalidates_local_cache(make_app, monkeypatch):
+    make_app()
+    cache = RankingCache(16)
+    monkeypatch.setattr(ranking_cache, '_local', cache)
+    ranking_rows('T0')
+    add_thesis('s1')
+    assert cache.stats()['size'] == 0
+    assert ranking_rows('T0')[0][3] == 1
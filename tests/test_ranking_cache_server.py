@@ -0,0 +1,37 @@
+# 共享排名缓存进程晚于 web 进程启动
+import multiprocessing
+import socket
+import time
+
+import version_four.ranking_cache as ranking_cache
+from version_four.ranking_cache import get_ranking_cache, serve_ranking_cache
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_reconnects_after_retry_interval(make_app, monkeypatch):
+    monkeypatch.setattr(ranking_cache, '_shared', {})
+    monkeypatch.setattr(ranking_cache, '_failed', {})
+    monkeypatch.setattr(ranking_cache, '_local', None)
+    address = ('127.0.0.1', free_port())
+    make_app(RANKING_CACHE_ADDRESS=address, RANKING_CACHE_RETRY=0.2, SECRET_KEY='k')
+    # 缓存进程还没启动，先用本进程的缓存
+    assert get_ranking_cache() is ranking_cache._local
+    context = multiprocessing.get_context('spawn')
+    server = context.Process(target=serve_ranking_cache, args=(address, b'k', 16), daemon=True)
+    server.start()
+    try:
+        deadline = time.monotonic() + 10
+        cache = get_ranking_cache()
+        while cache is ranking_cache._local and time.monotonic() < deadline:
+            time.sleep(0.1)
+            cache = get_ranking_cache()
+        assert cache is not ranking_cache._local
+        assert cache.stats()['maxsize'] == 16
+    finally:
+        server.terminate()
+        server.join()
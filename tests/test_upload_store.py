@@ -0,0 +1,60 @@
+# 上传文件仓库：同样内容的重复上传只导入一次
+import multiprocessing
+import time
+
+from version_four.upload_page.upload_store import UploadStore
+
+
+def claim(folder, results):
+    store = UploadStore(folder)
+    record, duplicate = store.claim('d', 'a.csv', 'undergraduate_thesis', 'insert', None, 1)
+    results.put(record is not None)
+
+
+def test_simultaneous_claims_across_processes(tmp_path):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    processes = [context.Process(target=claim, args=(str(tmp_path), results)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert sorted(results.get() for _ in processes) == [False, False, False, True]
+
+
+def test_imported_and_importing_are_duplicates(tmp_path):
+    store = UploadStore(str(tmp_path))
+    record, duplicate = store.claim('d', 'a.csv', 'undergraduate_thesis', 'insert', None, 1)
+    assert record is not None and duplicate is None
+    assert store.claim('d', 'a.csv', 'undergraduate_thesis', 'insert', None, 1)[1]['status'] == 'importing'
+    store.finish('d', 'undergraduate_thesis', 'imported', 10)
+    assert store.claim('d', 'a.csv', 'undergraduate_thesis', 'insert', None, 1)[1]['rows'] == 10
+    # 其他表、强制导入不算重复
+    assert store.claim('d', 'a.csv', 'department_internship', 'insert', None, 1)[1] is None
+    assert store.claim('d', 'a.csv', 'department_internship', 'insert', None, 1, force=True)[1] is None
+
+
+def test_stale_importing_can_be_retried(tmp_path):
+    store = UploadStore(str(tmp_path))
+    store.claim('d', 'a.csv', 'undergraduate_thesis', 'insert', None, 1)
+    # 超时
+    time.sleep(0.05)
+    assert store.claim('d', 'a.csv', 'undergraduate_thesis', 'insert', None, 1, stale_after=0.01)[1] is None
+    # 登记导入的进程已经退出
+    index = store._load()
+    index['d']['undergraduate_thesis']['pid'] = 2 ** 22 + 1
+    store._save(index)
+    assert store.claim('d', 'a.csv', 'undergraduate_thesis', 'insert', None, 1)[1] is None
+
+
+def test_records_are_kept_per_worksheet(tmp_path):
+    store = UploadStore(str(tmp_path))
+    store.claim('d', 'a.csv', 'undergraduate_thesis', 'insert', None, 1)
+    store.finish('d', 'undergraduate_thesis', 'imported', 10)
+    # 同样的内容再导入另一张表，不影响前一张表的记录
+    store.claim('d', 'a.csv', 'department_internship', 'insert', None, 1)
+    store.finish('d', 'department_internship', 'failed')
+    assert store.get('d', 'undergraduate_thesis')['status'] == 'imported'
+    assert store.get('d', 'undergraduate_thesis')['rows'] == 10
+    assert store.get('d', 'department_internship')['status'] == 'failed'
+    assert store.claim('d', 'a.csv', 'undergraduate_thesis', 'insert', None, 1)[1]['rows'] == 10
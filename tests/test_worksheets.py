@@ -0,0 +1,26 @@
+# 修改页面的按主键修改
+from version_four.database import db
+from version_four.models import UndergraduateThesi
+from version_four.worksheets import WORKSHEETS
+
+
+def thesis_record(student_id, topic='t'):
+    return {"学生姓名": "a", "学生学号": student_id, "学院": "c", "专业": "m", "专业号": "1", "年级": "2020",
+            "毕业论文题目": topic, "毕业论文成绩": "90", "毕业论文指导老师": "教师0", "毕业论文指导老师工号": "T0"}
+
+
+def test_update_existing_record(make_app):
+    make_app()
+    sheet = WORKSHEETS['undergraduate_thesis']
+    sheet.add(thesis_record('s1'))
+    assert sheet.update(thesis_record('s1', topic='new'))
+    assert db.session.get(UndergraduateThesi, 's1').thesis_topic == 'new'
+
+
+def test_update_does_not_insert_missing_record(make_app):
+    make_app()
+    sheet = WORKSHEETS['undergraduate_thesis']
+    sheet.add(thesis_record('s1'))
+    # 页面上把学号改成了 s2：找不到记录，不新增，原记录不变
+    assert not sheet.update(thesis_record('s2', topic='new'))
+    assert [row.student_id for row in UndergraduateThesi.query.all()] == ['s1']
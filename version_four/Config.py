@@ -14,4 +14,44 @@ class Config(object):
     #上传文件
     UPLOAD_FOLDER = 'uploads'
     # Flask 用来保护会话数据的关键配置
-    SECRET_KEY = 'ccnu'
\ No newline at end of file
+    SECRET_KEY = 'ccnu'
+    # 批量导入：整张表分批多行插入，并在一个事务内提交，失败则整体回滚
+    IMPORT_BULK = True
+    # 批量导入时每条INSERT语句包含的行数
+    IMPORT_BATCH_SIZE = 1000
+    # 流式导入时每次从文件读取的行数，决定导入过程的内存峰值
+    IMPORT_CHUNK_SIZE = 10000
+    # 后台导入：上传后立即返回任务编号，由本地线程池/进程池完成解析和写库
+    IMPORT_ASYNC = True
+    # 后台导入的执行方式：'thread' 线程池 或 'process' 进程池
+    IMPORT_JOB_EXECUTOR = 'thread'
+    IMPORT_JOB_WORKERS = 2
+    # 保留的已结束任务数量
+    IMPORT_JOB_HISTORY = 100
+    # 教师排名表的维护方式：'recompute' 每次flush按教师重新汇总；'incremental' 只累加每行带来的差值
+    RANKING_MAINTENANCE = 'recompute'
+    # 批量上传默认的导入方式：'insert' 只插入；'upsert' 按主键插入或更新（重新上传修正后的表格时使用）
+    IMPORT_MODE = 'insert'
+    # xlsx 读取引擎：'auto' 优先使用已安装的 calamine（pip install python-calamine），否则用 openpyxl 只读模式；也可指定 'calamine' 或 'openpyxl'
+    XLSX_READER = 'auto'
+    # 写库前按列校验导入文件（类型、主键重复、教工号是否存在），有错误时整个文件都不导入
+    IMPORT_VALIDATE = True
+    # 是否在后台把上传的原始文件按内容的 sha256 另存一份到 UPLOAD_FOLDER（相同内容只存一份，解析和导入不依赖这份文件）
+    UPLOAD_ARCHIVE = False
+    # 整个工作簿导入时解析和校验各工作表的进程数，None 按CPU核数；设为 1 则在当前进程里用线程解析（工作表只有一张时也是如此）
+    IMPORT_PARSE_WORKERS = None
+    # 试导入时最多列出多少行的变化明细（新增、更新的行数仍全部统计）
+    IMPORT_DIFF_LIMIT = 1000
+    # 修改页面每页显示的记录数，以及请求中 limit 参数允许的最大值
+    MODIFY_PAGE_SIZE = 50
+    MODIFY_PAGE_SIZE_MAX = 500
+    # 导出时每次从数据库取出并写出的行数
+    EXPORT_CHUNK_SIZE = 1000
+    # 分析页面排名缓存最多保留的教师数，0 表示不缓存
+    RANKING_CACHE_SIZE = 1024
+    # 多个 web 进程共用的排名缓存进程地址，如 ('127.0.0.1', 5001)，用 flask ranking-cache-server 启动；None 表示每个进程各自缓存
+    RANKING_CACHE_ADDRESS = None
+    # 上传文件仓库中状态一直是“导入中”的记录超过这么多秒后视为中断，可以重新上传导入；登记的进程已退出时也视为中断
+    UPLOAD_IMPORT_TIMEOUT = 6 * 3600
+    # 连接共享排名缓存进程失败或出错后，隔多少秒再尝试连接
+    RANKING_CACHE_RETRY = 30
\ No newline at end of file
@@ -1,8 +1,14 @@
 # 导入蓝图
-from flask import Blueprint, render_template, request, redirect, url_for
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify
 from flask_login import login_required
+from sqlalchemy import select
 
+from version_four.conditional import conditional_response, data_versions
+from version_four.database import db
 from version_four.models import UndergraduateWorkloadTeacherRanking
+from version_four.ranking_cache import cached_ranking_rows, get_ranking_cache
+from version_four.teacher_profile import load_teacher_profile
+from version_four.worksheets import WORKSHEETS
 
 """
 实例化蓝图对象
@@ -12,22 +18,63 @@ from version_four.models import UndergraduateWorkloadTeacherRanking
 """
 analyse_page_blueprint = Blueprint('analyse_page', __name__,template_folder='templates')
 
+RANKING_TABLE = UndergraduateWorkloadTeacherRanking.__tablename__
+
 @analyse_page_blueprint.route('/analyse_page', methods=['POST', 'GET'])
 @login_required
 def analyse_page():
+    teacher_id = request.values.get('teacher_id')
     if request.method == 'POST':
-        teacher_id = request.form.get('teacher_id')
-        teacher_name = request.form.get('teacher_name')
-        results = UndergraduateWorkloadTeacherRanking.query.filter_by(teacher_id=teacher_id,
-                                                                      teacher_name=teacher_name).all()
-        print("***********************")
-        print(results)
-        print("***********************")
-        result = [record.UndergraduateWorkloadTeacherRanking_list(results) for record in results]
-        columns = ["教工号", "教师名称", "本科课程总学时", "毕业论文学生人数", "毕业论文P",
-                   "指导教学实习人数", "指导教学实习周数", "指导教学实习P",
-                   "负责实习点建设与管理P", "指导本科生竞赛P", "指导本科生科研P", "本科生导师制", "教研教改P",
-                   "一流课程", "教学成果奖", "公共服务"]
-        return render_template('analyse_page.html', result=result[0], columns=columns)
+        return render_ranking(teacher_id, request.form.get('teacher_name'))
+    elif teacher_id:
+        # 按这位教师在排名表中的数据版本返回条件响应，数据没变时返回 304
+        return conditional_response([RANKING_TABLE], teacher_id,
+                                    lambda: render_ranking(teacher_id, request.args.get('teacher_name')))
     else:
-        return render_template('analyse_page.html')
\ No newline at end of file
+        return render_template('analyse_page.html')
+
+
+def render_ranking(teacher_id, teacher_name):
+    # 教师名称在取回的行中比对
+    result = [row for row in ranking_rows(teacher_id) if row[1] == teacher_name]
+    columns = ["教工号", "教师名称", "本科课程总学时", "毕业论文学生人数", "毕业论文P",
+               "指导教学实习人数", "指导教学实习周数", "指导教学实习P",
+               "负责实习点建设与管理P", "指导本科生竞赛P", "指导本科生科研P", "本科生导师制", "教研教改P",
+               "一流课程", "教学成果奖", "公共服务"]
+    return render_template('analyse_page.html', result=result, columns=columns)
+
+
+# 按教工号缓存转换好的排名行，缓存带着这位教师在排名表中的数据版本，版本变了才重新查询。
+# 版本和排名行在一个新连接的新事务中读取：请求自己的事务可能早已开始（登录时就查过用户），
+# 在可重复读隔离级别下读到的是那时的快照
+def ranking_rows(teacher_id):
+    with db.engine.connect() as connection:
+        stamp, _ = data_versions([RANKING_TABLE], teacher_id, connection)
+        return cached_ranking_rows(teacher_id, tuple(stamp),
+                                   lambda: load_ranking_rows(connection, teacher_id))
+
+
+# 查询一位教师的排名记录，整个结果集只转换一次
+def load_ranking_rows(connection, teacher_id):
+    model = UndergraduateWorkloadTeacherRanking
+    results = connection.execute(select(model.__table__).where(model.teacher_id == teacher_id)).all()
+    return model.UndergraduateWorkloadTeacherRanking_list(results)
+
+
+# 排名缓存的命中次数、未命中次数、命中率和当前条目数
+@analyse_page_blueprint.route('/analyse_page/cache_stats')
+@login_required
+def cache_stats():
+    return jsonify(get_ranking_cache().stats())
+
+
+# 一位教师在十张工作量表中的全部记录，按表分组，一次数据库往返取完
+@analyse_page_blueprint.route('/analyse_page/profile')
+@login_required
+def teacher_profile():
+    teacher_id = request.args.get('teacher_id')
+    if not teacher_id:
+        return jsonify({'error': '请提供教工号'}), 400
+    return conditional_response([sheet.model.__tablename__ for sheet in WORKSHEETS.values()], teacher_id,
+                                lambda: jsonify({'teacher_id': teacher_id,
+                                                 'worksheets': load_teacher_profile(teacher_id)}))
@@ -1,3 +1,5 @@
+import time
+import click
 from flask import Flask, render_template, request, redirect, url_for, flash
 from flask_migrate import Migrate
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
@@ -6,7 +8,9 @@ from version_four.database import db
 from version_four.modify_page.modify_page_bp import modify_page_blueprint
 from version_four.analyse_page.analyse_page_bp  import analyse_page_blueprint
 from version_four.upload_page.upload_page_bp import upload_page_blueprint
-from version_four.models import UndergraduateWorkloadTeacherRanking, TeacherInformation
+from version_four.models import UndergraduateWorkloadTeacherRanking, TeacherInformation, verify_rankings, \
+    recompute_all_rankings, mark_rankings_changed
+from version_four.ranking_cache import serve_ranking_cache
 
 app = Flask(__name__, template_folder='templates')
 
@@ -85,6 +89,44 @@ def index():
     return render_template('index.html',teacher_id=current_user.teacher_id)
 
 
+# 从十张源表全量重建教师排名表，批量导入后或每晚定时执行
+@app.cli.command('recompute-rankings')
+def recompute_rankings_command():
+    start = time.perf_counter()
+    try:
+        count = recompute_all_rankings(db.session.connection())
+        mark_rankings_changed(db.session, None)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    click.echo('已重建 %d 位教师的排名记录，用时 %.2f 秒' % (count, time.perf_counter() - start))
+
+
+# 用全量重算核对教师排名表中的累计值，增量维护模式下可定期执行
+@app.cli.command('verify-rankings')
+def verify_rankings_command():
+    mismatches = verify_rankings(db.session.connection())
+    for teacher_id, column, stored, expected in mismatches:
+        if column is None:
+            click.echo('%s 缺少排名记录' % teacher_id)
+        else:
+            click.echo('%s %s 表中为 %s，重算为 %s' % (teacher_id, column, stored, expected))
+    click.echo('核对完成，共 %d 处不一致' % len(mismatches))
+    if mismatches:
+        raise SystemExit(1)
+
+
+# 运行多个 web 进程共用的排名缓存，配置 RANKING_CACHE_ADDRESS 后各进程连接它
+@app.cli.command('ranking-cache-server')
+def ranking_cache_server_command():
+    address = app.config.get('RANKING_CACHE_ADDRESS')
+    if not address:
+        raise click.UsageError('请先配置 RANKING_CACHE_ADDRESS')
+    click.echo('排名缓存进程监听 %s:%s，容量 %d' % (address[0], address[1], app.config['RANKING_CACHE_SIZE']))
+    serve_ranking_cache(tuple(address), str(app.config['SECRET_KEY']).encode('utf-8'), app.config['RANKING_CACHE_SIZE'])
+
+
 app.register_blueprint(upload_page_blueprint)
 app.register_blueprint(modify_page_blueprint)
 app.register_blueprint(analyse_page_blueprint)
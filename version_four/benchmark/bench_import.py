@@ -0,0 +1,126 @@
+# 导入全过程的性能测试：对每张表用 generate_data 生成的文件依次测量
+#   解析（analyse_worksheet，含写库前校验）、写库（process_work）、排名表维护（deferred_rankings 退出时的重算和提交）
+# 三个阶段的耗时和进程内存峰值。默认使用临时的 SQLite 文件，也可以指定本地 MySQL：
+#   python -m version_four.benchmark.bench_import --rows 100000 --teachers 500
+#   python -m version_four.benchmark.bench_import --database mysql+pymysql://root:密码@localhost/teacherwork_bench --reset
+# MySQL 请使用单独的测试库，--reset 会清空其中的全部表
+import argparse
+import os
+import tempfile
+import time
+
+from flask import Flask
+from sqlalchemy import func, select
+
+from version_four.Config import Config
+from version_four.benchmark.generate_data import FORMATS, teacher_frame, write_worksheet
+from version_four.database import db
+from version_four.models import TeacherInformation, deferred_rankings, verify_rankings
+from version_four.upload_page.upload_page_bp import analyse_worksheet, process_work
+from version_four.worksheets import WORKSHEETS
+
+
+def create_app(database):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(SQLALCHEMY_DATABASE_URI=database, SQLALCHEMY_ECHO=False)
+    db.init_app(app)
+    return app
+
+
+# 清零本进程的内存峰值（VmHWM），每个阶段单独统计；内核不支持时峰值是累计的
+def reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+# 本进程的内存峰值（MB），不是 Linux 时用 ru_maxrss
+def peak_rss():
+    try:
+        with open('/proc/self/status') as f:
+            return [int(line.split()[1]) for line in f if line.startswith('VmHWM')][0] // 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+
+
+def stage(func, *args):
+    """执行一个阶段，返回 (结果, 耗时秒数, 内存峰值MB)"""
+    reset_peak_rss()
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start, peak_rss()
+
+
+def seed_teachers(teachers):
+    rows = [{'teacher_id': teacher_id, 'teacher_name': teacher_name, 'password_hash': None}
+            for teacher_id, teacher_name in teacher_frame(teachers).itertuples(index=False)]
+    db.session.execute(TeacherInformation.__table__.insert(), rows)
+    db.session.commit()
+
+
+def benchmark_worksheet(file_name, worksheet, bulk):
+    json_data_list, parse_time, parse_peak = stage(analyse_worksheet, file_name, worksheet, True)
+    # 手动进入 deferred_rankings：写库在其中完成，退出时的重算和提交单独计时
+    rankings = deferred_rankings()
+    rankings.__enter__()
+    try:
+        _, insert_time, insert_peak = stage(lambda: (process_work(worksheet, json_data_list, bulk),
+                                                     db.session.flush()))
+    except BaseException as e:
+        rankings.__exit__(type(e), e, e.__traceback__)
+        raise
+    rows = len(json_data_list)
+    del json_data_list
+    _, trigger_time, trigger_peak = stage(rankings.__exit__, None, None, None)
+    return rows, (parse_time, parse_peak), (insert_time, insert_peak), (trigger_time, trigger_peak)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10000, help='每张表的行数，1000 到 1000000')
+    parser.add_argument('--teachers', type=int, default=200)
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--worksheet', default=None, help='只测某一张表，默认测全部十张表')
+    parser.add_argument('--row-by-row', action='store_true', help='逐行ORM写入（process_work 的默认方式），默认批量插入')
+    parser.add_argument('--database', default=None, help='数据库连接，默认使用临时的 SQLite 文件')
+    parser.add_argument('--reset', action='store_true', help='先清空数据库中的全部表')
+    parser.add_argument('--data', default=None, help='导入文件的目录，默认使用临时目录，已存在的文件直接复用')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        database = args.database or 'sqlite:///' + os.path.join(folder, 'bench.db')
+        data = args.data or folder
+        os.makedirs(data, exist_ok=True)
+        app = create_app(database)
+        with app.app_context():
+            if args.reset:
+                db.drop_all()
+            db.create_all()
+            if db.session.execute(select(func.count()).select_from(TeacherInformation)).scalar():
+                raise SystemExit("数据库 %s 中已有数据，请使用单独的测试库并加 --reset" % database)
+            seed_teachers(args.teachers)
+
+            worksheets = [args.worksheet] if args.worksheet else list(WORKSHEETS)
+            print("%s，每张表 %d 行，%d 位教师，%s，%s" % (db.engine.url.render_as_string(hide_password=True),
+                                                  args.rows, args.teachers, args.format,
+                                                  "逐行写入" if args.row_by_row else "批量插入"))
+            print("%-40s %10s %10s %10s %10s %10s %10s" % ("worksheet", "解析(秒)", "峰值(MB)", "写库(秒)", "峰值(MB)",
+                                                         "排名(秒)", "峰值(MB)"))
+            for worksheet in worksheets:
+                file_name = os.path.join(data, "%s_%d.%s" % (worksheet, args.rows, args.format))
+                if not os.path.exists(file_name):
+                    write_worksheet(data, worksheet, args.rows, args.teachers, args.format)
+                rows, parse, insert, trigger = benchmark_worksheet(file_name, worksheet, not args.row_by_row)
+                assert rows == args.rows
+                print("%-40s %10.2f %10d %10.2f %10d %10.2f %10d" % ((worksheet,) + parse + insert + trigger))
+            mismatches = verify_rankings(db.session.connection())
+            print("排名表核对：%s" % ("一致" if not mismatches else "%d 处不一致" % len(mismatches)))
+
+
+if __name__ == '__main__':
+    main()
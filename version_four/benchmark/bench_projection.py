@@ -0,0 +1,80 @@
+# 查询结果转二维列表的开销对比：查询整个ORM对象再逐个取属性（原来各个 *_list 方法的做法）
+# 与只查询显示的各列、直接得到行元组（Worksheet.select_columns）。
+# 每种方式分别统计每行耗时、每行新分配的内存峰值（tracemalloc）和结果持有期间每行仍占用的内存块数
+# 用法（在工程根目录下）：python -m version_four.benchmark.bench_projection --rows 20000
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+
+from flask import Flask
+from sqlalchemy import select
+
+from version_four.benchmark.generate_data import generate_frame, teacher_frame
+from version_four.database import db
+from version_four.models import TeacherInformation
+from version_four.upload_page.bulk_import import bulk_import
+from version_four.upload_page.upload_page_bp import frame_to_records
+from version_four.worksheets import WORKSHEETS
+
+
+def entity_rows(sheet):
+    results = db.session.execute(select(sheet.model)).scalars().all()
+    return sheet.serialize(results), results
+
+
+def projected_rows(sheet):
+    results = db.session.execute(sheet.select_columns()).all()
+    return sheet.serialize(results), results
+
+
+def measure(func, sheet, rows):
+    """返回 (每行微秒, 每行分配峰值字节, 每行持有的内存块数)"""
+    db.session.expunge_all()
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    start = time.perf_counter()
+    data, results = func(sheet)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # 结果和会话里的对象都还在，这时多出来的内存块就是这次查询留下的
+    retained = sys.getallocatedblocks() - blocks
+    assert len(data) == rows
+    del data, results
+    db.session.expunge_all()
+    return elapsed / rows * 1e6, peak / rows, retained / rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--teachers', type=int, default=200)
+    parser.add_argument('--worksheet', default=None, help='只测某一张表，默认测全部十张表')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', IMPORT_BATCH_SIZE=1000, IMPORT_VALIDATE=False)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(TeacherInformation.__table__.insert(),
+                           [{'teacher_id': teacher_id, 'teacher_name': teacher_name}
+                            for teacher_id, teacher_name in teacher_frame(args.teachers).itertuples(index=False)])
+        db.session.commit()
+        worksheets = [args.worksheet] if args.worksheet else list(WORKSHEETS)
+        print("%d 行，每行：耗时(微秒) / 分配峰值(字节) / 持有内存块数" % args.rows)
+        print("%-40s %26s %26s" % ("worksheet", "ORM对象", "列投影行元组"))
+        for worksheet in worksheets:
+            sheet = WORKSHEETS[worksheet]
+            bulk_import(worksheet, frame_to_records(generate_frame(worksheet, args.rows, args.teachers), worksheet))
+            assert entity_rows(sheet)[0] == projected_rows(sheet)[0]
+            before = measure(entity_rows, sheet, args.rows)
+            after = measure(projected_rows, sheet, args.rows)
+            print("%-40s %8.1f / %6.0f / %6.1f %8.1f / %6.0f / %6.1f" % ((worksheet,) + before + after))
+
+
+if __name__ == '__main__':
+    main()
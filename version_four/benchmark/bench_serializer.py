@@ -0,0 +1,116 @@
+# 查询结果序列化的回归测试：一位教师名下有 N 条毕业论文时，
+# 原来的写法每条记录调用一次 UndergraduateThesi_list，而它又重新查询整张表，耗时随 N 平方增长；
+# 现在整个结果集只调用一次 serialize_rows，耗时应与 N 成正比。
+# 按最小和最大行数的耗时估算复杂度的指数（线性约为 1，平方约为 2），超过 --max-exponent 时以非零状态退出
+# 用法（在工程根目录下）：python -m version_four.benchmark.bench_serializer --rows 250 500 1000 2000 4000 8000
+import argparse
+import math
+import sys
+import time
+
+from flask import Flask
+
+from version_four.benchmark.generate_data import generate_frame
+from version_four.database import db
+from version_four.models import TeacherInformation, UndergraduateThesi
+from version_four.upload_page.bulk_import import bulk_import
+from version_four.upload_page.upload_page_bp import frame_to_records
+from version_four.worksheets import WORKSHEETS
+
+WORKSHEET = 'undergraduate_thesis'
+TEACHER_ID = 'T00000'
+
+
+# 原来的 UndergraduateThesi_list：不管传入的结果，重新查询整张表
+def old_thesi_list():
+    data_list = []
+    for result in UndergraduateThesi.query.all():
+        data_list.append([result.student_name, result.student_id, result.college, result.major, result.major_id,
+                          result.grade, result.thesis_topic, result.thesis_grade, result.teacher_name,
+                          result.teacher_id])
+    return data_list
+
+
+def old_serialize():
+    results = UndergraduateThesi.query.filter_by(teacher_id=TEACHER_ID).all()
+    return [old_thesi_list() for record in results][0]
+
+
+def model_serialize():
+    results = UndergraduateThesi.query.filter_by(teacher_id=TEACHER_ID).all()
+    return UndergraduateThesi.UndergraduateThesi_list(results)
+
+
+def worksheet_serialize():
+    sheet = WORKSHEETS[WORKSHEET]
+    return sheet.serialize(db.session.execute(sheet.select_columns().filter_by(teacher_id=TEACHER_ID)).all())
+
+
+def measure(func, repeat):
+    best = None
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def load(rows):
+    db.session.execute(UndergraduateThesi.__table__.delete())
+    db.session.commit()
+    # 只有一位教师，全部记录都属于他
+    bulk_import(WORKSHEET, frame_to_records(generate_frame(WORKSHEET, rows, 1), WORKSHEET))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[250, 500, 1000, 2000, 4000, 8000])
+    parser.add_argument('--old-max-rows', type=int, default=500, help='原来的写法是平方复杂度，只测到这个行数')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-exponent', type=float, default=1.5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', IMPORT_BATCH_SIZE=1000)
+    db.init_app(app)
+    methods = [('原来的写法', old_serialize), ('UndergraduateThesi_list', model_serialize),
+               ('Worksheet.serialize', worksheet_serialize)]
+    failed = False
+    with app.app_context():
+        db.create_all()
+        db.session.add(TeacherInformation(teacher_id=TEACHER_ID, teacher_name='教师00000'))
+        db.session.commit()
+        timings = {name: [] for name, func in methods}
+        print("%8s %16s %26s %22s" % ("行数", "原来的写法(秒)", "UndergraduateThesi_list(秒)", "Worksheet.serialize(秒)"))
+        for rows in sorted(args.rows):
+            load(rows)
+            assert model_serialize() == worksheet_serialize()
+            line = [rows]
+            for name, func in methods:
+                if func is old_serialize and rows > args.old_max_rows:
+                    line.append(None)
+                    continue
+                elapsed = measure(func, args.repeat if func is not old_serialize else 1)
+                timings[name].append((rows, elapsed))
+                line.append(elapsed)
+            print("%8d %16s %26s %22s" % tuple([line[0]] + ['-' if value is None else '%.4f' % value
+                                                            for value in line[1:]]))
+        # 耗时 ∝ 行数^指数
+        for name, func in methods:
+            points = timings[name]
+            if len(points) < 2:
+                continue
+            (rows, elapsed), (last_rows, last_elapsed) = points[0], points[-1]
+            exponent = math.log(last_elapsed / elapsed) / math.log(last_rows / rows)
+            print("%s: 复杂度指数 %.2f" % (name, exponent))
+            if func is not old_serialize and exponent > args.max_exponent:
+                failed = True
+    if failed:
+        print("序列化耗时不再随行数线性增长")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# xlsx 读取速度与内存对比：pandas 默认的 read_excel、各个只读引擎的 XlsxReader、同样数据的 csv
+# 用法（在工程根目录下）：python -m version_four.benchmark.bench_xlsx_reader --rows 50000
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from version_four.benchmark.bench_analyse_worksheet import make_frame
+from version_four.upload_page.readers import CalamineWorkbook, XLSX_ENGINES
+
+# 在子进程里读取一次文件，输出耗时和进程内存峰值，各方式的内存峰值互不影响
+READ_SCRIPT = """
+import sys, time
+import pandas as pd
+from version_four.upload_page.readers import iter_table_chunks
+method, file_name, chunk_size = sys.argv[1], sys.argv[2], int(sys.argv[3])
+start = time.perf_counter()
+if method == 'read_excel':
+    rows = len(pd.read_excel(file_name))
+else:
+    rows = sum(len(df) for df in iter_table_chunks(file_name, chunk_size, None if method == 'csv' else method))
+elapsed = time.perf_counter() - start
+# ru_maxrss 会带上 fork 前父进程的峰值，这里读本进程的 VmHWM
+peak = [int(line.split()[1]) for line in open('/proc/self/status') if line.startswith('VmHWM')][0]
+print(rows, elapsed, peak // 1024)
+"""
+
+
+def measure(method, file_name, chunk_size):
+    output = subprocess.run([sys.executable, '-c', READ_SCRIPT, method, file_name, str(chunk_size)],
+                            check=True, capture_output=True, text=True).stdout.split()
+    return int(output[0]), float(output[1]), int(output[2])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--worksheet', default='undergraduate_workload_course_ranking')
+    args = parser.parse_args()
+
+    df = make_frame(args.worksheet, args.rows)
+    with tempfile.TemporaryDirectory() as folder:
+        xlsx_file = os.path.join(folder, 'bench.xlsx')
+        csv_file = os.path.join(folder, 'bench.csv')
+        df.to_excel(xlsx_file, index=False)
+        df.to_csv(csv_file, index=False)
+
+        methods = [('read_excel', xlsx_file)]
+        methods += [(engine, xlsx_file) for engine in XLSX_ENGINES if engine != 'calamine' or CalamineWorkbook]
+        methods += [('csv', csv_file)]
+        print("%d 行 x %d 列，分块 %d 行" % (args.rows, len(df.columns), args.chunk_size))
+        print("%-12s %10s %12s %14s" % ("方式", "耗时(秒)", "行/秒", "内存峰值(MB)"))
+        for method, file_name in methods:
+            rows, elapsed, peak = measure(method, file_name, args.chunk_size)
+            assert rows == args.rows
+            print("%-12s %10.2f %12.0f %14d" % (method, elapsed, rows / elapsed, peak))
+
+
+if __name__ == '__main__':
+    main()
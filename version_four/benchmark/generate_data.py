@@ -0,0 +1,155 @@
+# 生成十张工作量表的模拟导入文件（csv/xlsx），行数和教师人数可调，用于导入性能测试。
+# 列名、列顺序和取值类型都来自 worksheets 登记表：主键逐行不重复，教工号从给定人数的教师中随机抽取，
+# 教师名称与教工号对应，日期、整数、小数按字段类型生成，分类字段从常见取值中抽取
+# 用法（在工程根目录下）：python -m version_four.benchmark.generate_data --rows 100000 --teachers 500 --out data
+import argparse
+import csv
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from version_four.worksheets import WORKSHEETS
+
+# 分类字段的常见取值
+VALUE_POOLS = {
+    '学年': ['2020-2021', '2021-2022', '2022-2023', '2023-2024'],
+    '学期': ['1', '2', '3'],
+    '自然年': [2020, 2021, 2022, 2023],
+    '上下半年': ['上半年', '下半年'],
+    '学院': ['计算机学院', '数学学院', '物理学院', '化学学院', '外国语学院'],
+    '专业': ['计算机科学与技术', '软件工程', '数学与应用数学', '应用物理学', '化学', '英语'],
+    '年级': ['2019', '2020', '2021', '2022', '2023'],
+    '毕业论文成绩': ['优秀', '良好', '中等', '及格'],
+    '级别': ['国家级', '省级', '校级'],
+    '获奖类别': ['一等奖', '二等奖', '三等奖'],
+    '获奖等级': ['国家级', '省级', '校级'],
+    '验收结果': ['优秀', '合格', '不合格'],
+    '验收结论': ['优秀', '合格', '不合格'],
+    '课程性质': ['线上', '线下', '混合式', '社会实践'],
+    '获奖年份': ['2020', '2021', '2022', '2023'],
+}
+
+# 日期字段的取值范围
+DATE_START = datetime.date(2018, 1, 1)
+DATE_DAYS = 365 * 6
+
+# 分块生成和写入，行数很大时内存占用只和块大小有关
+GENERATE_CHUNK_SIZE = 100000
+
+FORMATS = ('csv', 'xlsx')
+
+
+def teacher_ids(teachers):
+    return ["T%05d" % n for n in range(teachers)]
+
+
+def teacher_name(teacher_id):
+    return "教师" + teacher_id[1:]
+
+
+def teacher_frame(teachers):
+    """模拟的教师信息：教工号和教师姓名"""
+    ids = teacher_ids(teachers)
+    return pd.DataFrame({'教工号': ids, '教师姓名': [teacher_name(teacher_id) for teacher_id in ids]})
+
+
+# 按字段长度截断，MySQL 的 varchar 超长会报错
+def _fit(values, length):
+    if length is None:
+        return values
+    return [value[:length] for value in values]
+
+
+def generate_frame(worksheet, rows, teachers, start=0, seed=0):
+    """生成一张表从第 start 行开始的 rows 行，同样的参数总是生成同样的数据"""
+    sheet = WORKSHEETS[worksheet]
+    table = sheet.model.__table__
+    rng = np.random.default_rng([seed, start])
+    numbers = np.arange(start, start + rows)
+    ids = np.array(teacher_ids(teachers), dtype=object)
+    teachers_of_rows = ids[rng.integers(0, teachers, rows)]
+    data = {}
+    for column, attr in sheet.fields.items():
+        kind = sheet.dtypes[column]
+        length = getattr(table.c[attr].type, 'length', None)
+        if attr == 'teacher_id':
+            data[column] = teachers_of_rows
+        elif attr == 'teacher_name':
+            data[column] = [teacher_name(teacher_id) for teacher_id in teachers_of_rows]
+        elif column in sheet.key_columns:
+            # 主键逐行不重复，自增的序号从1开始
+            if kind == 'integer':
+                data[column] = numbers + 1
+            else:
+                data[column] = _fit(["%s%08d" % (attr[:2].upper(), n) for n in numbers], length)
+        elif column in VALUE_POOLS:
+            data[column] = rng.choice(VALUE_POOLS[column], rows)
+        elif kind == 'integer':
+            data[column] = rng.integers(1, 200, rows)
+        elif kind == 'number':
+            data[column] = np.round(rng.random(rows) * 100, 2)
+        elif kind == 'date':
+            days = rng.integers(0, DATE_DAYS, rows)
+            data[column] = [DATE_START + datetime.timedelta(days=int(day)) for day in days]
+        else:
+            data[column] = _fit(["%s%d" % (column, n) for n in rng.integers(0, max(rows // 10, 1), rows)], length)
+    return pd.DataFrame(data, columns=sheet.columns)
+
+
+def iter_frames(worksheet, rows, teachers, seed=0, chunk_size=GENERATE_CHUNK_SIZE):
+    for start in range(0, rows, chunk_size):
+        yield generate_frame(worksheet, min(chunk_size, rows - start), teachers, start, seed)
+
+
+def write_csv(file_name, worksheet, rows, teachers, seed=0):
+    with open(file_name, 'w', encoding='utf-8', newline='') as f:
+        f.write(",".join(WORKSHEETS[worksheet].columns) + "\n")
+        for df in iter_frames(worksheet, rows, teachers, seed):
+            df.to_csv(f, header=False, index=False, quoting=csv.QUOTE_MINIMAL)
+
+
+def write_xlsx(file_name, worksheet, rows, teachers, seed=0):
+    # write_only 模式逐行写出，不在内存里保留整张工作表
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(WORKSHEETS[worksheet].table_name)
+    sheet.append(WORKSHEETS[worksheet].columns)
+    for df in iter_frames(worksheet, rows, teachers, seed):
+        for row in df.itertuples(index=False):
+            sheet.append([value.item() if isinstance(value, np.generic) else value for value in row])
+    workbook.save(file_name)
+
+
+def write_worksheet(folder, worksheet, rows, teachers, file_format='csv', seed=0):
+    """生成一张表的导入文件，返回文件路径"""
+    file_name = os.path.join(folder, "%s_%d.%s" % (worksheet, rows, file_format))
+    if file_format == 'xlsx':
+        write_xlsx(file_name, worksheet, rows, teachers, seed)
+    else:
+        write_csv(file_name, worksheet, rows, teachers, seed)
+    return file_name
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000, help='每张表的行数，1000 到 1000000')
+    parser.add_argument('--teachers', type=int, default=200)
+    parser.add_argument('--format', choices=FORMATS, nargs='+', default=['csv'])
+    parser.add_argument('--worksheet', default=None, help='只生成某一张表，默认生成全部十张表')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='benchmark_data')
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    teacher_frame(args.teachers).to_csv(os.path.join(args.out, 'teachers_%d.csv' % args.teachers), index=False)
+    worksheets = [args.worksheet] if args.worksheet else list(WORKSHEETS)
+    for worksheet in worksheets:
+        for file_format in args.format:
+            file_name = write_worksheet(args.out, worksheet, args.rows, args.teachers, file_format, args.seed)
+            print(file_name, os.path.getsize(file_name) // 1024, 'KB')
+
+
+if __name__ == '__main__':
+    main()
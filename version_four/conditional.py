@@ -0,0 +1,64 @@
+# 条件请求：按数据版本表（models.DataVersion）中相关表、相关教师的版本号生成强 ETag 和 Last-Modified，
+# 浏览器再次请求时带上 If-None-Match，数据没有变化就直接返回 304，
+# 只查一次很小的版本表，不查询工作量数据也不渲染页面。
+# Last-Modified 只精确到秒，同一秒内的两次写入无法区分，只用于展示，不凭 If-Modified-Since 返回 304
+import hashlib
+from datetime import timezone
+
+from flask import request, make_response
+from flask_login import current_user
+from sqlalchemy import case, func, select
+
+from version_four.database import db
+from version_four.models import DataVersion, ALL_TEACHERS
+
+
+def data_versions(table_names, teacher_id=None, connection=None):
+    """
+    返回 (各表的版本, 最后修改时间)。指定教工号时用这位教师在各表中的版本，
+    还没有记录过这位教师的表用整张表的版本（各行版本号之和）；不指定时都用整张表的版本。
+    一条 GROUP BY 查询取完，connection 为 None 时在当前会话的事务中查询
+    """
+    table = DataVersion.__table__
+    mine = table.c.teacher_id == (teacher_id or '')
+    statement = (select(table.c.table_name, func.sum(table.c.version), func.max(table.c.updated_at),
+                        func.max(case((mine, table.c.version))), func.max(case((mine, table.c.updated_at))))
+                 .where(table.c.table_name.in_(table_names)).group_by(table.c.table_name))
+    found = {row[0]: row for row in (connection if connection is not None else db.session).execute(statement)}
+    versions = []
+    last_modified = None
+    for table_name in sorted(table_names):
+        row = found.get(table_name)
+        if row is None:
+            versions.append((table_name, None, 0))
+            continue
+        _, total, total_updated_at, version, updated_at = row
+        if version is not None:
+            versions.append((table_name, teacher_id, version))
+        else:
+            versions.append((table_name, ALL_TEACHERS, total))
+            updated_at = total_updated_at
+        if last_modified is None or updated_at > last_modified:
+            last_modified = updated_at
+    return versions, last_modified
+
+
+def conditional_response(table_names, teacher_id, render):
+    """
+    GET 请求的条件响应：ETag 由请求地址、当前用户和各表的数据版本决定，If-None-Match 中有这个 ETag 时返回 304，
+    否则调用 render() 生成响应。响应要求浏览器每次都来验证，不会直接使用过期的缓存
+    """
+    versions, last_modified = data_versions(table_names, teacher_id)
+    etag = hashlib.sha1(repr((request.full_path, current_user.get_id(), versions)).encode('utf-8')).hexdigest()
+    if last_modified is not None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
@@ -1,10 +1,15 @@
 # coding: utf-8
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from version_four.database import db
-from sqlalchemy import event, func
-from sqlalchemy.orm import Session
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, select, insert, update, cast, case, Integer, inspect
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session, object_session
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from version_four.ranking_cache import invalidate_rankings
+from version_four.serializers import serialize_rows
 from sqlalchemy.ext.declarative import declarative_base
 
 
@@ -59,51 +64,11 @@ class CompetitionAward(db.Model):
     teacher = db.relationship('TeacherInformation', backref='competition_awards')
 
     @classmethod
-    def CompetitionAward_list(cls,results):
-        data_list = []
-        for result in results:
-            data_list.append([
-                result.id,
-                result.event_name,
-                result.work_name,
-                result.award_category,
-                result.award_level,
-                result.teacher_name,
-                result.teacher_id,
-                result.total_workload,
-                result.award_year
-            ])
-        return data_list
-
-    @staticmethod
-    def add_competition_award(json_data):
-        new_award = CompetitionAward(
-            id=json_data["序号"],
-            event_name=json_data["赛事名称"],
-            work_name=json_data["作品名称"],
-            award_category=json_data["获奖类别"],
-            award_level=json_data["获奖等级"],
-            teacher_name=json_data["指导教师"],
-            teacher_id=json_data["指导教师工号"],
-            total_workload=json_data["总工作量"],
-            award_year=json_data["获奖年份"]
-        )
-        db.session.add(new_award)
-        db.session.commit()
-
-    @staticmethod
-    def update_CompetitionAward(json_data):
-        new_competitionAward = CompetitionAward.query.filter_by(id=json_data["序号"]).first()
-        new_competitionAward.event_name = json_data["赛事名称"]
-        new_competitionAward.work_name = json_data["作品名称"]
-        new_competitionAward.award_category = json_data["获奖类别"]
-        new_competitionAward.award_level = json_data["获奖等级"]
-        new_competitionAward.teacher_name = json_data["指导教师"]
-        new_competitionAward.teacher_id = json_data["指导教师工号"]
-        new_competitionAward.total_workload = json_data["总工作量"]
-        new_competitionAward.award_year = json_data["获奖年份"]
-        db.session.add(new_competitionAward)
-        db.session.commit()
+    def CompetitionAward_list(cls, results):
+        return serialize_rows(results, [
+            'id', 'event_name', 'work_name', 'award_category', 'award_level', 'teacher_name', 'teacher_id',
+            'total_workload', 'award_year'
+        ])
 
 
 class DepartmentInternship(db.Model):
@@ -122,46 +87,10 @@ class DepartmentInternship(db.Model):
                               backref='department_internships')
 
     @classmethod
-    def DepartmentInternship_list(cls,results):
-        data_list = []
-        for result in results:
-            data_list.append([
-                result.student_name,
-                result.student_id,
-                result.major,
-                result.grade,
-                result.teacher_name,
-                result.teacher_id,
-                result.week
-            ])
-        return data_list
-
-    @staticmethod
-    def add_internship_record(json_data):
-        new_internship = DepartmentInternship(
-            student_name=json_data["学生姓名"],
-            student_id=json_data["学生学号"],
-            major=json_data["专业"],
-            grade=json_data["年级"],
-            teacher_name=json_data["学部内实习指导教师"],
-            teacher_id=json_data["学部内实习指导教师工号"],
-            week=json_data["实习周数"]
-        )
-        db.session.add(new_internship)
-        db.session.commit()
-
-    @staticmethod
-    def update_DepartmentInternship(json_data):
-        new_departmentInternship = DepartmentInternship.query.filter_by(
-            student_id=json_data["学生学号"]).first()
-        new_departmentInternship.student_name = json_data["学生姓名"]
-        new_departmentInternship.major = json_data["专业"]
-        new_departmentInternship.grade = json_data["年级"]
-        new_departmentInternship.teacher_name = json_data["学部内实习指导教师"]
-        new_departmentInternship.teacher_id = json_data["学部内实习指导教师工号"]
-        new_departmentInternship.week = json_data["实习周数"]
-        db.session.add(new_departmentInternship)
-        db.session.commit()
+    def DepartmentInternship_list(cls, results):
+        return serialize_rows(results, [
+            'student_name', 'student_id', 'major', 'grade', 'teacher_name', 'teacher_id', 'week'
+        ])
 
 
 class EducationalResearchProject(db.Model):
@@ -186,58 +115,11 @@ class EducationalResearchProject(db.Model):
                               backref='educational_research_projects')
 
     @classmethod
-    def EducationalResearchProject_list(cls,results):
-        data_list = []
-        for result in results:
-            data_list.append([
-                result.id,
-                result.project_name,
-                result.project_leader,
-                result.project_members,
-                result.project_level,
-                result.start_date,
-                result.end_date,
-                result.acceptance_result,
-                result.teacher_name,
-                result.teacher_id,
-                result.research_project_workload
-            ])
-        return data_list
-
-    @staticmethod
-    def add_research_project(json_data):
-        new_project = EducationalResearchProject(
-            id=json_data["序号"],
-            project_name=json_data["项目名称"],
-            project_leader=json_data["项目负责人"],
-            project_members=json_data["项目成员"],
-            project_level=json_data["级别"],
-            start_date=json_data["立项时间"],
-            end_date=json_data["结项时间"],
-            acceptance_result=json_data["验收结论"],
-            teacher_name=json_data["教师姓名"],
-            teacher_id=json_data["工号"],
-            research_project_workload=json_data["教研项目工作量"]
-        )
-        db.session.add(new_project)
-        db.session.commit()
-
-    @staticmethod
-    def update_EducationalResearchProject(json_data):
-        new_EducationalResearchProject = EducationalResearchProject.query.filter_by(
-            id=json_data["序号"]).first()
-        new_EducationalResearchProject.project_name = json_data["项目名称"]
-        new_EducationalResearchProject.project_leader = json_data["项目负责人"]
-        new_EducationalResearchProject.project_members = json_data["项目成员"]
-        new_EducationalResearchProject.project_level = json_data["级别"]
-        new_EducationalResearchProject.start_date = json_data["立项时间"]
-        new_EducationalResearchProject.end_date = json_data["结项时间"]
-        new_EducationalResearchProject.acceptance_result = json_data["验收结论"]
-        new_EducationalResearchProject.teacher_name = json_data["教师姓名"]
-        new_EducationalResearchProject.teacher_id = json_data["工号"]
-        new_EducationalResearchProject.research_project_workload = json_data["教研项目工作量"]
-        db.session.add(new_EducationalResearchProject)
-        db.session.commit()
+    def EducationalResearchProject_list(cls, results):
+        return serialize_rows(results, [
+            'id', 'project_name', 'project_leader', 'project_members', 'project_level', 'start_date', 'end_date',
+            'acceptance_result', 'teacher_name', 'teacher_id', 'research_project_workload'
+        ])
 
 
 class FirstClassCourse(db.Model):
@@ -259,48 +141,11 @@ class FirstClassCourse(db.Model):
                               backref='first_class_courses')
 
     @classmethod
-    def FirstClassCourse_list(cls,results):
-        data_list = []
-        for result in results:
-            data_list.append([
-                result.id,
-                result.course_type,
-                result.content,
-                result.leader,
-                result.remark,
-                result.teacher_name,
-                result.teacher_id,
-                result.first_class_course_workload
-            ])
-        return data_list
-
-    @staticmethod
-    def add_first_class_course(json_data):
-        new_course = FirstClassCourse(
-            id=json_data["序号"],
-            course_type=json_data["课程性质"],
-            content=json_data["内容"],
-            leader=json_data["负责人"],
-            remark=json_data["备注"],
-            teacher_name=json_data["教师姓名"],
-            teacher_id=json_data["工号"],
-            first_class_course_workload=json_data["一流课程工作量"]
-        )
-        db.session.add(new_course)
-        db.session.commit()
-
-    @staticmethod
-    def update_FirstClassCourse(json_data):
-        new_FirstClassCourse = FirstClassCourse.query.filter_by(id=json_data["序号"]).first()
-        new_FirstClassCourse.course_type = json_data["课程性质"]
-        new_FirstClassCourse.content = json_data["内容"]
-        new_FirstClassCourse.leader = json_data["负责人"]
-        new_FirstClassCourse.remark = json_data["备注"]
-        new_FirstClassCourse.teacher_name = json_data["教师姓名"]
-        new_FirstClassCourse.teacher_id = json_data["工号"]
-        new_FirstClassCourse.first_class_course_workload = json_data["一流课程工作量"]
-        db.session.add(new_FirstClassCourse)
-        db.session.commit()
+    def FirstClassCourse_list(cls, results):
+        return serialize_rows(results, [
+            'id', 'course_type', 'content', 'leader', 'remark', 'teacher_name', 'teacher_id',
+            'first_class_course_workload'
+        ])
 
 
 class PublicService(db.Model):
@@ -320,47 +165,10 @@ class PublicService(db.Model):
                               backref='public_services')
 
     @classmethod
-    def PublicService_list(cls,results):
-        data_list = []
-        for result in results:
-            data_list.append([
-                result.id,
-                result.serve_date,
-                result.content,
-                result.teacher_name,
-                result.work_duration,
-                result.class_hours,
-                result.teacher_id
-            ])
-        return data_list
-
-    @staticmethod
-    def add_public_service_record(json_data):
-        new_record = PublicService(
-            id=json_data["序号"],
-            serve_date=json_data["日期"],
-            content=json_data["内容"],
-            teacher_name=json_data["姓名"],
-            work_duration=json_data["工作时长"],
-            class_hours=json_data["课时"],
-            teacher_id=json_data["教师工号"],
-            workload=json_data["工作量"]
-        )
-        db.session.add(new_record)
-        db.session.commit()
-
-    @staticmethod
-    def update_PublicService(json_data):
-        new_PublicService = PublicService.query.filter_by(id=json_data["序号"])
-        new_PublicService.serve_date = json_data["日期"]
-        new_PublicService.content = json_data["内容"]
-        new_PublicService.teacher_name = json_data["姓名"]
-        new_PublicService.work_duration = json_data["工作时长"]
-        new_PublicService.class_hours = json_data["课时"]
-        new_PublicService.teacher_id = json_data["教师工号"]
-        new_PublicService.workload = json_data["工作量"]
-        db.session.add(new_PublicService)
-        db.session.add()
+    def PublicService_list(cls, results):
+        return serialize_rows(results, [
+            'id', 'serve_date', 'content', 'teacher_name', 'work_duration', 'class_hours', 'teacher_id'
+        ])
 
 
 class StudentResearch(db.Model):
@@ -383,54 +191,11 @@ class StudentResearch(db.Model):
                               backref='student_researches')
 
     @classmethod
-    def StudentResearch_list(cls,results):
-        data_list = []
-        for result in results:
-            data_list.append([
-                result.id,
-                result.project_name,
-                result.project_level,
-                result.leader,
-                result.student_id,
-                result.total_members,
-                result.teacher_name,
-                result.teacher_id,
-                result.acceptance_result,
-                result.workload
-            ])
-        return data_list
-
-    @staticmethod
-    def add_student_research_record(json_data):
-        new_record = StudentResearch(
-            id=json_data["序号"],
-            project_name=json_data["项目名称"],
-            project_level=json_data["级别"],
-            leader=json_data["负责人"],
-            student_id=json_data["学号"],
-            total_members=json_data["项目组总人数"],
-            teacher_name=json_data["指导老师"],
-            teacher_id=json_data["指导老师工号"],
-            acceptance_result=json_data["验收结果"],
-            workload=json_data["工作量"]
-        )
-        db.session.add(new_record)
-        db.session.commit()
-
-    @staticmethod
-    def update_StudentResearch(json_data):
-        new_StudentResearch = StudentResearch.query.filter_by(id=json_data["序号"]).first()
-        new_StudentResearch.project_name = json_data["项目名称"]
-        new_StudentResearch.project_level = json_data["级别"]
-        new_StudentResearch.leader = json_data["负责人"]
-        new_StudentResearch.student_id = json_data["学号"]
-        new_StudentResearch.total_members = json_data["项目组总人数"]
-        new_StudentResearch.teacher_name = json_data["指导老师"]
-        new_StudentResearch.teacher_id = json_data["指导老师工号"]
-        new_StudentResearch.acceptance_result = json_data["验收结果"]
-        new_StudentResearch.workload = json_data["工作量"]
-        db.session.add(new_StudentResearch)
-        db.session.commit()
+    def StudentResearch_list(cls, results):
+        return serialize_rows(results, [
+            'id', 'project_name', 'project_level', 'leader', 'student_id', 'total_members', 'teacher_name',
+            'teacher_id', 'acceptance_result', 'workload'
+        ])
 
 
 class TeachingAchievementAward(db.Model):
@@ -455,57 +220,11 @@ class TeachingAchievementAward(db.Model):
                               backref='teaching_achievement_awards')
 
     @classmethod
-    def TeachingAchievementAward_list(cls,results):
-        data_list = []
-        for result in results:
-            data_list.append([
-                result.id,
-                result.student_session,
-                result.student_date,
-                result.recommended_achievement_name,
-                result.main_completion_person_name,
-                result.award_category,
-                result.award_level,
-                result.remark,
-                result.teacher_name,
-                result.teacher_id,
-                result.teaching_achievement_workload
-            ])
-        return data_list
-
-    @staticmethod
-    def add_teaching_achievement_record(json_data):
-        new_record = TeachingAchievementAward(
-            id=json_data["序号"],
-            student_session=json_data["届"],
-            student_date=json_data["时间"],
-            recommended_achievement_name=json_data["推荐成果名称"],
-            main_completion_person_name=json_data["成果主要完成人名称"],
-            award_category=json_data["获奖类别"],
-            award_level=json_data["获奖等级"],
-            remark=json_data["备注"],
-            teacher_name=json_data["教师"],
-            teacher_id=json_data["工号"],
-            teaching_achievement_workload=json_data["教学成果工作量"]
-        )
-        db.session.add(new_record)
-        db.session.commit()
-
-    @staticmethod
-    def update_TeachingAchievementAward(json_data):
-        new_TeachingAchievementAward = TeachingAchievementAward.query.filter_by(id=json_data["序号"])
-        new_TeachingAchievementAward.student_session = json_data["届"]
-        new_TeachingAchievementAward.student_date = json_data["时间"]
-        new_TeachingAchievementAward.recommended_achievement_name = json_data["推荐成果名称"]
-        new_TeachingAchievementAward.main_completion_person_name = json_data["成果主要完成人名称"]
-        new_TeachingAchievementAward.award_category = json_data["获奖类别"]
-        new_TeachingAchievementAward.award_level = json_data["获奖等级"]
-        new_TeachingAchievementAward.remark = json_data["备注"]
-        new_TeachingAchievementAward.teacher_name = json_data["教师"]
-        new_TeachingAchievementAward.teacher_id = json_data["工号"]
-        new_TeachingAchievementAward.teaching_achievement_workload = json_data["教学成果工作量"]
-        db.session.add(new_TeachingAchievementAward)
-        db.session.commit()
+    def TeachingAchievementAward_list(cls, results):
+        return serialize_rows(results, [
+            'id', 'student_session', 'student_date', 'recommended_achievement_name', 'main_completion_person_name',
+            'award_category', 'award_level', 'remark', 'teacher_name', 'teacher_id', 'teaching_achievement_workload'
+        ])
 
 
 class UndergraduateMentorshipSystem(db.Model):
@@ -524,43 +243,10 @@ class UndergraduateMentorshipSystem(db.Model):
                               backref='undergraduate_mentorship_systems')
 
     @classmethod
-    def UndergraduateMentorshipSystem_list(cls,results):
-        data_list = []
-        for result in results:
-            data_list.append([
-                result.teacher_name,
-                result.teacher_id,
-                result.student_name,
-                result.grade,
-                result.student_id,
-                result.teacher_workload
-            ])
-        return data_list
-
-    @staticmethod
-    def add_mentorship_record(json_data):
-        new_record = UndergraduateMentorshipSystem(
-            teacher_name=json_data["导师姓名"],
-            teacher_id=json_data["教工号"],
-            student_name=json_data["学生姓名"],
-            grade=json_data["年级"],
-            student_id=json_data["学号"],
-            teacher_workload=json_data["教师工作量"]
-        )
-        db.session.add(new_record)
-        db.session.commit()
-
-    @staticmethod
-    def update_UndergraduateMentorshipSystem(json_data):
-        new_UndergraduateMentorshipSystem = UndergraduateMentorshipSystem.query.filter_by(
-            student_id=json_data["学号"]).first()
-        new_UndergraduateMentorshipSystem.teacher_name = json_data["导师姓名"]
-        new_UndergraduateMentorshipSystem.teacher_id = json_data["教工号"]
-        new_UndergraduateMentorshipSystem.student_name = json_data["学生姓名"]
-        new_UndergraduateMentorshipSystem.grade = json_data["年级"]
-        new_UndergraduateMentorshipSystem.teacher_workload = json_data["教师工作量"]
-        db.session.add(new_UndergraduateMentorshipSystem)
-        db.session.commit()
+    def UndergraduateMentorshipSystem_list(cls, results):
+        return serialize_rows(results, [
+            'teacher_name', 'teacher_id', 'student_name', 'grade', 'student_id', 'teacher_workload'
+        ])
 
 
 class UndergraduateThesi(db.Model):
@@ -583,55 +269,11 @@ class UndergraduateThesi(db.Model):
                               backref='undergraduate_thesis')
 
     @classmethod
-    def UndergraduateThesi_list(cls):
-        results = cls.query.all()
-        data_list = []
-        for result in results:
-            data_list.append([
-                result.student_name,
-                result.student_id,
-                result.college,
-                result.major,
-                result.major_id,
-                result.grade,
-                result.thesis_topic,
-                result.thesis_grade,
-                result.teacher_name,
-                result.teacher_id
-            ])
-        return data_list
-
-    @staticmethod
-    def add_thesis_record(json_data):
-        new_record = UndergraduateThesi(
-            student_name=json_data["学生姓名"],
-            student_id=json_data["学生学号"],
-            college=json_data["学院"],
-            major=json_data["专业"],
-            major_id=json_data["专业号"],
-            grade=json_data["年级"],
-            thesis_topic=json_data["毕业论文题目"],
-            thesis_grade=json_data["毕业论文成绩"],
-            teacher_name=json_data["毕业论文指导老师"],
-            teacher_id=json_data["毕业论文指导老师工号"]
-        )
-        db.session.add(new_record)
-        db.session.commit()
-
-    @staticmethod
-    def update_UndergraduateThesi(json_data):
-        new_undergraduate_thesis = UndergraduateThesi.query.filter_by(student_id=json_data["学生学号"]).first()
-        new_undergraduate_thesis.student_name = json_data["学生姓名"]
-        new_undergraduate_thesis.college = json_data["学院"]
-        new_undergraduate_thesis.major = json_data["专业"]
-        new_undergraduate_thesis.major_id = json_data["专业号"]
-        new_undergraduate_thesis.grade = json_data["年级"]
-        new_undergraduate_thesis.thesis_topic = json_data["毕业论文题目"]
-        new_undergraduate_thesis.thesis_grade = json_data["毕业论文成绩"]
-        new_undergraduate_thesis.teacher_name = json_data["毕业论文指导老师"]
-        new_undergraduate_thesis.teacher_id = json_data["毕业论文指导老师工号"]
-        db.session.add(new_undergraduate_thesis)
-        db.session.commit()
+    def UndergraduateThesi_list(cls, results):
+        return serialize_rows(results, [
+            'student_name', 'student_id', 'college', 'major', 'major_id', 'grade', 'thesis_topic', 'thesis_grade',
+            'teacher_name', 'teacher_id'
+        ])
 
 
 class UndergraduateWorkloadCourseRanking(db.Model):
@@ -667,97 +309,14 @@ class UndergraduateWorkloadCourseRanking(db.Model):
                               backref='undergraduate_workload_course_rankings')
 
     @classmethod
-    def UndergraduateWorkloadCourseRanking_list(cls,results):
-        data_list = []
-        for result in results:
-            data_list.append([
-                result.academic_year,
-                result.semester,
-                result.calendar_year,
-                result.half_year,
-                result.course_code,
-                result.teaching_class,
-                result.course_name,
-                result.teacher_id,
-                result.teacher_name,
-                result.seminar_hours,
-                result.lecture_hours,
-                result.lab_hours,
-                result.enrolled_students,
-                result.student_weight_coefficient_b,
-                result.course_type_coefficient_a,
-                result.total_lecture_hours_p1,
-                result.lab_group_count,
-                result.lab_coefficient,
-                result.total_lab_hours_p2,
-                result.course_split_ratio_for_engineering_center,
-                result.total_course_hours
-            ])
-        return data_list
-
-    @staticmethod
-    def add_UndergraduateWorkloadCourseRanking(json_data):
-        new_course_ranking = UndergraduateWorkloadCourseRanking(
-            academic_year=json_data["学年"],
-            semester=json_data["学期"],
-            calendar_year=json_data["自然年"],
-            half_year=json_data["上下半年"],
-            course_code=json_data["课程号"],
-            teaching_class=json_data["教学班"],
-            course_name=json_data["课程名称"],
-            teacher_id=json_data["教工号"],
-            teacher_name=json_data["教师名称"],
-            seminar_hours=json_data["研讨学时"],
-            lecture_hours=json_data["授课学时"],
-            lab_hours=json_data["实验学时"],
-            enrolled_students=json_data["选课人数"],
-            student_weight_coefficient_b=json_data["学生数量权重系数B"],
-            course_type_coefficient_a=json_data["课程类型系数A"],
-            total_lecture_hours_p1=json_data["理论课总学时P1"],
-            lab_group_count=json_data["实验分组数"],
-            lab_coefficient=json_data["实验课系数"],
-            total_lab_hours_p2=json_data["实验课总学时P2"],
-            course_split_ratio_for_engineering_center=json_data["课程拆分占比（工程中心用）"],
-            total_course_hours=json_data["课程总学时"]
-        )
-        db.session.add(new_course_ranking)
-        db.session.commit()
-
-    @staticmethod
-    def update_UndergraduateWorkloadCourseRanking_list(json_data):
-        new_workload_course_ranking = UndergraduateWorkloadCourseRanking.query.filter_by(
-            course_code=json_data["课程号"],
-            teaching_class=json_data["教学班"]
-        ).first()
-
-        if not new_workload_course_ranking:
-            new_workload_course_ranking = UndergraduateWorkloadCourseRanking(
-                course_code=json_data["课程号"],
-                teaching_class=json_data["教学班"]
-            )
-
-        new_workload_course_ranking.academic_year = json_data["学年"]
-        new_workload_course_ranking.semester = json_data["学期"]
-        new_workload_course_ranking.calendar_year = json_data["自然年"]
-        new_workload_course_ranking.half_year = json_data["上下半年"]
-        new_workload_course_ranking.course_name = json_data["课程名称"]
-        new_workload_course_ranking.seminar_hours = json_data["研讨学时"]
-        new_workload_course_ranking.lecture_hours = json_data["授课学时"]
-        new_workload_course_ranking.lab_hours = json_data["实验学时"]
-        new_workload_course_ranking.enrolled_students = json_data["选课人数"]
-        new_workload_course_ranking.student_weight_coefficient_b = json_data["学生数量权重系数B"]
-        new_workload_course_ranking.course_type_coefficient_a = json_data["课程类型系数A"]
-        new_workload_course_ranking.total_lecture_hours_p1 = json_data["理论课总学时P1"]
-        new_workload_course_ranking.lab_group_count = json_data["实验分组数"]
-        new_workload_course_ranking.lab_coefficient = json_data["实验课系数"]
-        new_workload_course_ranking.total_lab_hours_p2 = json_data["实验课总学时P2"]
-        new_workload_course_ranking.course_split_ratio_for_engineering_center = json_data["课程拆分占比（工程中心用）"]
-        new_workload_course_ranking.total_course_hours = json_data["课程总学时"]
-        new_workload_course_ranking.teacher_id = json_data["教工号"]
-        new_workload_course_ranking.teacher_name = json_data["教师名称"]
-
-        db.session.add(new_workload_course_ranking)
-        db.session.commit()
+    def UndergraduateWorkloadCourseRanking_list(cls, results):
+        return serialize_rows(results, [
+            'academic_year', 'semester', 'calendar_year', 'half_year', 'course_code', 'teaching_class',
+            'course_name', 'teacher_id', 'teacher_name', 'seminar_hours', 'lecture_hours', 'lab_hours',
+            'enrolled_students', 'student_weight_coefficient_b', 'course_type_coefficient_a',
+            'total_lecture_hours_p1', 'lab_group_count', 'lab_coefficient', 'total_lab_hours_p2',
+            'course_split_ratio_for_engineering_center', 'total_course_hours'
+        ])
 
 
 class UndergraduateWorkloadTeacherRanking(db.Model):
@@ -787,28 +346,15 @@ class UndergraduateWorkloadTeacherRanking(db.Model):
                               primaryjoin='UndergraduateWorkloadTeacherRanking.teacher_id == TeacherInformation.teacher_id',
                               backref='undergraduate_workload_teacher_ranking')
 
-    def UndergraduateWorkloadTeacherRanking_list(cls,results):
-        data_list = []
-        for result in results:
-            data_list.append([
-                result.teacher_id,
-                result.teacher_name,
-                result.undergraduate_course_total_hours,
-                result.graduation_thesis_student_count,
-                result.graduation_thesis_p,
-                result.teaching_internship_student_count,
-                result.teaching_internship_weeks,
-                result.teaching_internship_p,
-                result.responsible_internship_construction_management_p,
-                result.guiding_undergraduate_competition_p,
-                result.guiding_undergraduate_research_p,
-                result.undergraduate_tutor_system,
-                result.teaching_research_and_reform_p,
-                result.first_class_course,
-                result.teaching_achievement_award,
-                result.public_service
-            ])
-        return data_list
+    @classmethod
+    def UndergraduateWorkloadTeacherRanking_list(cls, results):
+        return serialize_rows(results, [
+            'teacher_id', 'teacher_name', 'undergraduate_course_total_hours', 'graduation_thesis_student_count',
+            'graduation_thesis_p', 'teaching_internship_student_count', 'teaching_internship_weeks',
+            'teaching_internship_p', 'responsible_internship_construction_management_p',
+            'guiding_undergraduate_competition_p', 'guiding_undergraduate_research_p', 'undergraduate_tutor_system',
+            'teaching_research_and_reform_p', 'first_class_course', 'teaching_achievement_award', 'public_service'
+        ])
 
 
 class workload_parameter(db.Model):
@@ -820,161 +366,540 @@ class workload_parameter(db.Model):
     intership_js = db.Column(db.Float, info={'description': '实习点建设'})
 
 
+# 数据版本：每张工作量表（和排名表）中每位教师的记录每提交一次有变化的事务，版本号加一。
+# 整张表的版本在查询时由各行的版本号求和得到（只增不减），不单独维护一行，并发写入不会都等在同一行的锁上；
+# teacher_id 为 '*' 的一行只在重算全部教师时写入。查询页面据此生成 ETag，数据没变时直接返回 304
+class DataVersion(db.Model):
+    __tablename__ = 'data_version'
+
+    table_name = db.Column(db.String(64), primary_key=True, info={'description': '表名'})
+    teacher_id = db.Column(db.String(255), primary_key=True, info={'description': '教工号'})
+    version = db.Column(db.Integer, nullable=False, default=1, info={'description': '版本号'})
+    updated_at = db.Column(db.DateTime, nullable=False, info={'description': '最后修改时间'})
+
+
+# 重算全部教师时登记的教工号
+ALL_TEACHERS = '*'
+
+
 # 触发器
+# 各表写入后不再逐行重算，而是在一次flush中收集受影响的教工号，flush结束时每位教师只用一条UPDATE重算一次
 
 
-def update_undergraduate_course_total_hours(mapper, connection, target):
-    session = Session(bind=connection)
-    course = session.query(UndergraduateWorkloadTeacherRanking).filter_by(teacher_id=target.teacher_id).one()
-    course.undergraduate_course_total_hours = session.query(
-        func.sum(mapper.c.total_course_hours)). \
-        filter(mapper.c.teacher_id == target.teacher_id). \
-        scalar()
-    session.commit()
-
-
-def update_graduation_thesis_info(mapper, connection, target):
-    session = Session(bind=connection)
-    teacher_id = target.teacher_id
-
-    # 更新毕业论文学生数量
-    graduation_thesis_student_count = (
-        session.query(func.count(mapper.c.student_id))
-        .filter(mapper.c.teacher_id == teacher_id)
-        .scalar()
-    )
-
-    # 查询毕业论文工作量参数
-    graduation_thesis_p_count = session.query(workload_parameter.graduation_thesis_p_count).scalar()
-
-    # 计算毕业论文工作量
-    graduation_thesis_p = graduation_thesis_p_count * graduation_thesis_student_count
-
-    # 查询该教师的记录
-    teacher = session.query(UndergraduateWorkloadTeacherRanking).filter_by(teacher_id=teacher_id).one()
-
-    # 更新毕业论文学生数量字段
-    teacher.graduation_thesis_student_count = graduation_thesis_student_count
-
-    # 更新毕业论文工作量字段
-    teacher.graduation_thesis_p = graduation_thesis_p
-
-    session.commit()
-
-
-def update_teaching_internship_student_info(mapper, connection, target):
-    session = Session(bind=connection)
-    teacher_id = target.teacher_id
-    # 更新指导教学实习的人数
-    internship_student_count = session.query(
-        func.count(mapper.c.student_id).filter(mapper.c.teacher_id == teacher_id).scalar())
-    # 更新指导教学实习的周数
-    internship_week_count = session.query(
-        func.sum(mapper.c.week).filter(mapper.c.teacher_id == teacher_id).scalar())
-    # 查询教学实习指导的参数
-    internship_count = session.query(workload_parameter.internship_count).scalar()
-    # 查询教学实习点的建设与管理P，这个直接查表得到
-    internship_js = session.query(workload_parameter.internship_js).scalar()
-    # 更新指导教学实习P
-    teaching_internship_student_count = internship_student_count * internship_week_count * internship_count
-    # 查询该教师的记录并更新
-    teacher = session.query(UndergraduateWorkloadTeacherRanking).filter_by(teacher_id=teacher_id).one()
-    teacher.teaching_internship_student_count = internship_student_count
-    teacher.teaching_internship_weeks = internship_week_count
-    teacher.teaching_internship_p = teaching_internship_student_count
-    teacher.responsible_internship_construction_management_p = internship_js
-    session.commit()
-
-
-def update_guiding_undergraduate_competition_p(mapper, connection, target):
-    session = Session(bind=connection)
-    course = session.query(UndergraduateWorkloadTeacherRanking).filter_by(teacher_id=target.teacher_id).one()
-    course.undergraduate_course_total_hours = session.query(
-        func.sum(mapper.c.total_workload)). \
-        filter(mapper.c.teacher_id == target.teacher_id). \
-        scalar()
-    session.commit()
-
-
-def update_guiding_undergraduate_research_p(mapper, connection, target):
-    session = Session(bind=connection)
-    course = session.query(UndergraduateWorkloadTeacherRanking).filter_by(teacher_id=target.teacher_id).one()
-    course.undergraduate_course_total_hours = session.query(
-        func.sum(mapper.c.workload)). \
-        filter(mapper.c.teacher_id == target.teacher_id). \
-        scalar()
-    session.commit()
-
-
-def update_undergraduate_tutor_system(mapper, connection, target):
-    session = Session(bind=connection)
-    course = session.query(UndergraduateWorkloadTeacherRanking).filter_by(teacher_id=target.teacher_id).one()
-    course.undergraduate_course_total_hours = session.query(
-        func.sum(mapper.c.teacher_workload)). \
-        filter(mapper.c.teacher_id == target.teacher_id). \
-        scalar()
-    session.commit()
-
-
-def update_teaching_research_and_reform_p(mapper, connection, target):
-    session = Session(bind=connection)
-    course = session.query(UndergraduateWorkloadTeacherRanking).filter_by(teacher_id=target.teacher_id).one()
-    course.undergraduate_course_total_hours = session.query(
-        func.sum(mapper.c.research_project_workload)). \
-        filter(mapper.c.teacher_id == target.teacher_id). \
-        scalar()
-    session.commit()
-
-
-def update_first_class_course(mapper, connection, target):
-    session = Session(bind=connection)
-    course = session.query(UndergraduateWorkloadTeacherRanking).filter_by(teacher_id=target.teacher_id).one()
-    course.undergraduate_course_total_hours = session.query(
-        func.sum(mapper.c.first_class_course_workload)). \
-        filter(mapper.c.teacher_id == target.teacher_id). \
-        scalar()
-    session.commit()
-
-
-def update_teaching_achievement_award(mapper, connection, target):
-    session = Session(bind=connection)
-    course = session.query(UndergraduateWorkloadTeacherRanking).filter_by(teacher_id=target.teacher_id).one()
-    course.undergraduate_course_total_hours = session.query(
-        func.sum(mapper.c.teaching_achievement_workload)). \
-        filter(mapper.c.teacher_id == target.teacher_id). \
-        scalar()
-    session.commit()
-
-
-def update_public_service(mapper, connection, target):
-    session = Session(bind=connection)
-    course = session.query(UndergraduateWorkloadTeacherRanking).filter_by(teacher_id=target.teacher_id).one()
-    course.undergraduate_course_total_hours = session.query(
-        func.sum(mapper.c.workload)). \
-        filter(mapper.c.teacher_id == target.teacher_id). \
-        scalar()
-    session.commit()
+# 排名表中与当前教师对应的源表记录
+def _teacher_rows(model):
+    return model.teacher_id == UndergraduateWorkloadTeacherRanking.teacher_id
+
+
+def _sum(model, column):
+    return select(func.coalesce(func.sum(column), 0)).where(_teacher_rows(model)).scalar_subquery()
+
+
+def _count(model, column):
+    return select(func.count(column)).where(_teacher_rows(model)).scalar_subquery()
 
 
-# 触发器监听
-db.event.listen(UndergraduateWorkloadCourseRanking, 'after_insert', update_undergraduate_course_total_hours)
-db.event.listen(UndergraduateWorkloadCourseRanking, 'after_update', update_undergraduate_course_total_hours)
 # 有几个触发器需要传递几个可变参数来计算工作量，将参数全部放在一张表里面了
-db.event.listen(UndergraduateThesi, 'after_insert', update_graduation_thesis_info)
-db.event.listen(UndergraduateThesi, 'after_update', update_graduation_thesis_info)
-db.event.listen(DepartmentInternship, 'after_insert', update_teaching_internship_student_info)
-db.event.listen(DepartmentInternship, 'after_update', update_teaching_internship_student_info)
-db.event.listen(CompetitionAward, 'after_insert', update_guiding_undergraduate_competition_p)
-db.event.listen(CompetitionAward, 'after_update', update_guiding_undergraduate_competition_p)
-db.event.listen(StudentResearch, 'after_insert', update_guiding_undergraduate_research_p)
-db.event.listen(StudentResearch, 'after_update', update_guiding_undergraduate_research_p)
-db.event.listen(UndergraduateMentorshipSystem, 'after_insert', update_undergraduate_tutor_system)
-db.event.listen(UndergraduateMentorshipSystem, 'after_update', update_undergraduate_tutor_system)
-db.event.listen(EducationalResearchProject, 'after_insert', update_teaching_research_and_reform_p)
-db.event.listen(EducationalResearchProject, 'after_update', update_teaching_research_and_reform_p)
-db.event.listen(FirstClassCourse, 'after_insert', update_first_class_course)
-db.event.listen(FirstClassCourse, 'after_update', update_first_class_course)
-db.event.listen(TeachingAchievementAward, 'after_insert', update_teaching_achievement_award)
-db.event.listen(TeachingAchievementAward, 'after_update', update_teaching_achievement_award)
-db.event.listen(PublicService, 'after_insert', update_public_service)
-db.event.listen(PublicService, 'after_update', update_public_service)
+def _param(column):
+    return select(column).limit(1).scalar_subquery()
+
+
+# 每张表影响的排名表字段，以及字段的计算方式（与排名表逐行对应的相关子查询）
+RANKING_AGGREGATES = {
+    UndergraduateWorkloadCourseRanking: {
+        'undergraduate_course_total_hours': _sum(UndergraduateWorkloadCourseRanking,
+                                                 UndergraduateWorkloadCourseRanking.total_course_hours),
+    },
+    UndergraduateThesi: {
+        'graduation_thesis_student_count': _count(UndergraduateThesi, UndergraduateThesi.student_id),
+        'graduation_thesis_p': _count(UndergraduateThesi, UndergraduateThesi.student_id) *
+                               _param(workload_parameter.graduation_thesis_p_count),
+    },
+    DepartmentInternship: {
+        'teaching_internship_student_count': _count(DepartmentInternship, DepartmentInternship.student_id),
+        'teaching_internship_weeks': _sum(DepartmentInternship, cast(DepartmentInternship.week, Integer)),
+        'teaching_internship_p': _count(DepartmentInternship, DepartmentInternship.student_id) *
+                                 _sum(DepartmentInternship, cast(DepartmentInternship.week, Integer)) *
+                                 _param(workload_parameter.intership_count),
+        # 实习点建设与管理P直接查参数表得到，只有指导了实习的教师才有
+        'responsible_internship_construction_management_p': case(
+            (_count(DepartmentInternship, DepartmentInternship.student_id) > 0, _param(workload_parameter.intership_js)),
+            else_=0),
+    },
+    CompetitionAward: {
+        'guiding_undergraduate_competition_p': _sum(CompetitionAward, CompetitionAward.total_workload),
+    },
+    StudentResearch: {
+        'guiding_undergraduate_research_p': _sum(StudentResearch, StudentResearch.workload),
+    },
+    UndergraduateMentorshipSystem: {
+        'undergraduate_tutor_system': _sum(UndergraduateMentorshipSystem,
+                                           UndergraduateMentorshipSystem.teacher_workload),
+    },
+    EducationalResearchProject: {
+        'teaching_research_and_reform_p': _sum(EducationalResearchProject,
+                                               EducationalResearchProject.research_project_workload),
+    },
+    FirstClassCourse: {
+        'first_class_course': _sum(FirstClassCourse, FirstClassCourse.first_class_course_workload),
+    },
+    TeachingAchievementAward: {
+        'teaching_achievement_award': _sum(TeachingAchievementAward,
+                                           TeachingAchievementAward.teaching_achievement_workload),
+    },
+    PublicService: {
+        'public_service': _sum(PublicService, PublicService.workload),
+    },
+}
+
+# IN 列表过长时分批执行
+RANKING_REFRESH_BATCH = 500
+
+
+# 还没有排名记录的教师先按教师信息表补一条空记录
+def _ensure_ranking_rows(connection, teacher_ids):
+    ranking = UndergraduateWorkloadTeacherRanking.__table__
+    existing = select(ranking.c.teacher_id).where(ranking.c.teacher_id.in_(teacher_ids))
+    missing = select(TeacherInformation.teacher_id, TeacherInformation.teacher_name). \
+        where(TeacherInformation.teacher_id.in_(teacher_ids), TeacherInformation.teacher_id.not_in(existing))
+    connection.execute(insert(ranking).from_select(['teacher_id', 'teacher_name'], missing))
+
+
+def refresh_rankings(connection, model, teacher_ids):
+    """按源表model重算这些教师在排名表中的相关字段，每批教师只执行一条UPDATE"""
+    teacher_ids = sorted(teacher_id for teacher_id in set(teacher_ids) if teacher_id is not None)
+    ranking = UndergraduateWorkloadTeacherRanking.__table__
+    for start in range(0, len(teacher_ids), RANKING_REFRESH_BATCH):
+        batch = teacher_ids[start:start + RANKING_REFRESH_BATCH]
+        _ensure_ranking_rows(connection, batch)
+        connection.execute(update(ranking).where(ranking.c.teacher_id.in_(batch)).values(RANKING_AGGREGATES[model]))
+
+
+# 增量模式：每行写入只把它对排名表的贡献差值加到对应教师上，不再扫描该教师的全部记录
+# 可累加的字段：排名表字段 -> (累加方式, 源表字段)，count 按非空计数，sum 按数值求和，sum_int 先取整再求和
+RANKING_DELTAS = {
+    UndergraduateWorkloadCourseRanking: {'undergraduate_course_total_hours': ('sum', 'total_course_hours')},
+    UndergraduateThesi: {'graduation_thesis_student_count': ('count', 'student_id')},
+    DepartmentInternship: {'teaching_internship_student_count': ('count', 'student_id'),
+                           'teaching_internship_weeks': ('sum_int', 'week')},
+    CompetitionAward: {'guiding_undergraduate_competition_p': ('sum', 'total_workload')},
+    StudentResearch: {'guiding_undergraduate_research_p': ('sum', 'workload')},
+    UndergraduateMentorshipSystem: {'undergraduate_tutor_system': ('sum', 'teacher_workload')},
+    EducationalResearchProject: {'teaching_research_and_reform_p': ('sum', 'research_project_workload')},
+    FirstClassCourse: {'first_class_course': ('sum', 'first_class_course_workload')},
+    TeachingAchievementAward: {'teaching_achievement_award': ('sum', 'teaching_achievement_workload')},
+    PublicService: {'public_service': ('sum', 'workload')},
+}
+
+# 由可累加字段再算出来的字段，传入可按字段名取值的列集合（排名表的列或全量重算时的汇总列）
+RANKING_DERIVED = {
+    UndergraduateThesi: {
+        'graduation_thesis_p': lambda c: c['graduation_thesis_student_count'] *
+                                         _param(workload_parameter.graduation_thesis_p_count),
+    },
+    DepartmentInternship: {
+        'teaching_internship_p': lambda c: c['teaching_internship_student_count'] * c['teaching_internship_weeks'] *
+                                           _param(workload_parameter.intership_count),
+        'responsible_internship_construction_management_p': lambda c: case(
+            (c['teaching_internship_student_count'] > 0, _param(workload_parameter.intership_js)), else_=0),
+    },
+}
+
+# 属性旧值没有加载时无法求差值
+_UNKNOWN = object()
+
+
+# 影响排名表的源表字段
+def _ranking_attrs(model):
+    return {'teacher_id'} | {attr for kind, attr in RANKING_DELTAS[model].values()}
+
+
+def _ranking_mode():
+    if has_app_context():
+        return current_app.config.get('RANKING_MAINTENANCE', 'recompute')
+    return 'recompute'
+
+
+# 取出属性在本次flush中的旧值和新值
+def _old_and_new(state, attr):
+    history = state.attrs[attr].history
+    if history.unchanged:
+        return history.unchanged[0], history.unchanged[0]
+    old = history.deleted[0] if history.deleted else _UNKNOWN
+    new = history.added[0] if history.added else _UNKNOWN
+    return old, new
+
+
+# 一行记录对排名表各字段的贡献
+def _contribution(spec, values):
+    result = {}
+    for column, (kind, attr) in spec.items():
+        value = values[attr]
+        if value is None:
+            result[column] = 0
+        elif kind == 'count':
+            result[column] = 1
+        elif kind == 'sum_int':
+            result[column] = int(float(value))
+        else:
+            result[column] = float(value)
+    return result
+
+
+def _add_delta(deltas, teacher_id, contribution, sign):
+    if teacher_id is None:
+        return
+    changes = deltas.setdefault(teacher_id, {})
+    for column, value in contribution.items():
+        changes[column] = changes.get(column, 0) + sign * value
+
+
+# 记录一行写入带来的差值，旧值未知或数值无法转换时返回False，改为整体重算
+def _collect_ranking_delta(session, model, target, operation):
+    spec = RANKING_DELTAS[model]
+    state = inspect(target)
+    old, new = {}, {}
+    for attr in _ranking_attrs(model):
+        old[attr], new[attr] = _old_and_new(state, attr)
+        if operation == 'insert' and new[attr] is _UNKNOWN:
+            new[attr] = None
+        if (operation != 'insert' and old[attr] is _UNKNOWN) or (operation != 'delete' and new[attr] is _UNKNOWN):
+            return False
+    try:
+        before = _contribution(spec, old) if operation != 'insert' else None
+        after = _contribution(spec, new) if operation != 'delete' else None
+    except (TypeError, ValueError):
+        return False
+    deltas = session.info.setdefault('ranking_deltas', {}).setdefault(model, {})
+    if before is not None:
+        _add_delta(deltas, old['teacher_id'], before, -1)
+    if after is not None:
+        _add_delta(deltas, new['teacher_id'], after, 1)
+    return True
+
+
+def apply_ranking_deltas(connection, model, deltas):
+    """把收集到的差值加到排名表上；排名表中还没有记录的教师无法增量，改为整体重算"""
+    ranking = UndergraduateWorkloadTeacherRanking.__table__
+    teacher_ids = sorted(deltas)
+    existing = set()
+    for start in range(0, len(teacher_ids), RANKING_REFRESH_BATCH):
+        batch = teacher_ids[start:start + RANKING_REFRESH_BATCH]
+        existing.update(connection.execute(select(ranking.c.teacher_id).where(ranking.c.teacher_id.in_(batch)))
+                        .scalars())
+    for teacher_id in teacher_ids:
+        if teacher_id not in existing:
+            continue
+        values = {column: func.coalesce(ranking.c[column], 0) + delta
+                  for column, delta in deltas[teacher_id].items() if delta}
+        if values:
+            connection.execute(update(ranking).where(ranking.c.teacher_id == teacher_id).values(values))
+    derived = RANKING_DERIVED.get(model)
+    updated = sorted(existing)
+    if derived:
+        values = {column: expression(ranking.c) for column, expression in derived.items()}
+        for start in range(0, len(updated), RANKING_REFRESH_BATCH):
+            batch = updated[start:start + RANKING_REFRESH_BATCH]
+            connection.execute(update(ranking).where(ranking.c.teacher_id.in_(batch)).values(values))
+    missing = [teacher_id for teacher_id in teacher_ids if teacher_id not in existing]
+    if missing:
+        refresh_rankings(connection, model, missing)
+
+
+def recompute_all_rankings(connection):
+    """
+    从十张源表全量重建教师排名表：每张表一条 GROUP BY 汇总，按教师信息表左连接后整体替换排名表，
+    删除和插入在调用方的同一个事务中完成，返回写入的教师数
+    """
+    ranking = UndergraduateWorkloadTeacherRanking.__table__
+    teacher = TeacherInformation.__table__
+    values = {}
+    joined = teacher
+    for model, spec in RANKING_DELTAS.items():
+        aggregates = []
+        for column, (kind, attr) in spec.items():
+            source = getattr(model, attr)
+            if kind == 'count':
+                aggregates.append(func.count(source).label(column))
+            elif kind == 'sum_int':
+                aggregates.append(func.sum(cast(source, Integer)).label(column))
+            else:
+                aggregates.append(func.sum(source).label(column))
+        summary = select(model.teacher_id, *aggregates).group_by(model.teacher_id).subquery()
+        joined = joined.outerjoin(summary, summary.c.teacher_id == teacher.c.teacher_id)
+        for column in spec:
+            values[column] = func.coalesce(summary.c[column], 0)
+    for model, derived in RANKING_DERIVED.items():
+        for column, expression in derived.items():
+            values[column] = expression(values)
+    columns = list(values)
+    statement = select(teacher.c.teacher_id, teacher.c.teacher_name, *[values[column] for column in columns]). \
+        select_from(joined)
+    connection.execute(ranking.delete())
+    result = connection.execute(insert(ranking).from_select(['teacher_id', 'teacher_name'] + columns, statement))
+    return result.rowcount
+
+
+def verify_rankings(connection):
+    """
+    用全量重算的结果核对排名表中的累计值，返回不一致的列表，
+    每项为 (教工号, 排名表字段, 表中的值, 重算的值)；源表中有记录但排名表缺少的教师，字段记为None
+    """
+    ranking = UndergraduateWorkloadTeacherRanking.__table__
+    expected = {column: expression for aggregates in RANKING_AGGREGATES.values()
+                for column, expression in aggregates.items()}
+    columns = list(expected)
+    statement = select(ranking.c.teacher_id,
+                       *[ranking.c[column] for column in columns],
+                       *[expression.label('expected_' + column) for column, expression in expected.items()])
+    mismatches = []
+    for row in connection.execute(statement):
+        for i, column in enumerate(columns):
+            stored, value = row[1 + i], row[1 + len(columns) + i]
+            stored = 0 if stored is None else float(stored)
+            value = 0 if value is None else float(value)
+            if abs(stored - value) > 1e-6 * max(1.0, abs(value)):
+                mismatches.append((row.teacher_id, column, stored, value))
+    ranked = select(ranking.c.teacher_id)
+    for model in RANKING_AGGREGATES:
+        missing = select(model.teacher_id).distinct(). \
+            where(model.teacher_id.is_not(None), model.teacher_id.not_in(ranked))
+        for teacher_id in connection.execute(missing).scalars():
+            mismatches.append((teacher_id, None, None, None))
+    return mismatches
+
+
+# 一行写入影响到的教工号，修改了工号时原来那位教师的统计也要重算
+def _changed_teacher_ids(target):
+    return [target.teacher_id] + list(inspect(target).attrs.teacher_id.history.deleted or ())
+
+
+# 重算模式下行级监听器只记录受影响的教工号，不访问数据库
+def _mark_ranking_dirty(session, model, target):
+    session.info.setdefault('ranking_dirty', {}).setdefault(model, set()).update(_changed_teacher_ids(target))
+
+
+class DeferredRankings(object):
+    """
+    批量导入期间暂停逐行维护排名表：监听器只登记受影响的表和教师，
+    退出时在同一事务内对这些教师只重算一次相关字段并提交；出现异常则整体回滚。
+    嵌套使用时内层沿用外层，由最外层统一重算和提交
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.touched = {}
+        self.outer = None
+
+    def touch(self, model, teacher_ids):
+        self.touched.setdefault(model, set()).update(
+            teacher_id for teacher_id in teacher_ids if teacher_id is not None)
+
+    # 受影响的排名表字段
+    @property
+    def columns(self):
+        return {column for model in self.touched for column in RANKING_AGGREGATES[model]}
+
+    def __enter__(self):
+        self.outer = self.session.info.get('ranking_deferred')
+        if self.outer is not None:
+            return self.outer
+        self.session.info['ranking_deferred'] = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.outer is not None:
+            return False
+        if exc_type is not None:
+            self.session.info.pop('ranking_deferred', None)
+            self.session.rollback()
+            return False
+        try:
+            try:
+                # 先把未写入的对象flush出去，这时监听器仍然只做登记
+                self.session.flush()
+            finally:
+                self.session.info.pop('ranking_deferred', None)
+            connection = self.session.connection()
+            for model, teacher_ids in self.touched.items():
+                refresh_rankings(connection, model, teacher_ids)
+                mark_rankings_changed(self.session, teacher_ids)
+                mark_versions_changed(self.session, model.__tablename__, teacher_ids)
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        return False
+
+
+def deferred_rankings(session=None):
+    return DeferredRankings(session if session is not None else db.session)
+
+
+def _collect_ranking_change(mapper, target, operation):
+    session = object_session(target)
+    if session is None:
+        return
+    deferred = session.info.get('ranking_deferred')
+    if deferred is not None:
+        deferred.touch(mapper.class_, _changed_teacher_ids(target))
+        return
+    if _ranking_mode() == 'incremental' and _collect_ranking_delta(session, mapper.class_, target, operation):
+        return
+    _mark_ranking_dirty(session, mapper.class_, target)
+
+
+def ranking_after_insert(mapper, connection, target):
+    _collect_ranking_change(mapper, target, 'insert')
+
+
+def ranking_after_update(mapper, connection, target):
+    _collect_ranking_change(mapper, target, 'update')
+
+
+def ranking_after_delete(mapper, connection, target):
+    _collect_ranking_change(mapper, target, 'delete')
+
+
+# flush结束时先累加差值，再把需要整体重算的教师统一重算
+def refresh_dirty_rankings(session, flush_context):
+    deltas = session.info.pop('ranking_deltas', None)
+    dirty = session.info.pop('ranking_dirty', None)
+    if not deltas and not dirty:
+        return
+    connection = session.connection()
+    for model, teacher_deltas in (deltas or {}).items():
+        apply_ranking_deltas(connection, model, teacher_deltas)
+        mark_rankings_changed(session, teacher_deltas)
+    for model, teacher_ids in (dirty or {}).items():
+        refresh_rankings(connection, model, teacher_ids)
+        mark_rankings_changed(session, teacher_ids)
+
+
+# 要删除的记录如果属性已过期，flush前先加载出来，否则无法知道它原来属于哪位教师、贡献了多少
+def load_deleted_rankings(session, flush_context, instances):
+    for target in session.deleted:
+        if type(target) in RANKING_DELTAS:
+            for attr in _ranking_attrs(type(target)):
+                getattr(target, attr)
+
+
+# 配合 active_history，修改字段时即使旧值已过期也会先加载旧值
+def _keep_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+# 回滚后丢弃未处理的记录
+def discard_dirty_rankings(session):
+    session.info.pop('ranking_deltas', None)
+    session.info.pop('ranking_dirty', None)
+    session.info.pop('ranking_changed', None)
+    session.info.pop('versions_changed', None)
+
+
+# 登记排名表中数据有变化的教师，teacher_ids 为 None 表示全部教师；事务提交后才让它们的排名缓存失效
+def mark_rankings_changed(session, teacher_ids):
+    changed = session.info.get('ranking_changed', set())
+    if changed is None or teacher_ids is None:
+        session.info['ranking_changed'] = None
+    else:
+        teacher_ids = [teacher_id for teacher_id in teacher_ids if teacher_id is not None]
+        changed.update(teacher_ids)
+        session.info['ranking_changed'] = changed
+    mark_versions_changed(session, UndergraduateWorkloadTeacherRanking.__tablename__, teacher_ids)
+
+
+# 登记某张表中数据有变化的教师，teacher_ids 为 None 表示全部教师；提交前统一写入数据版本表
+def mark_versions_changed(session, table_name, teacher_ids):
+    versions = session.info.setdefault('versions_changed', {})
+    changed = versions.get(table_name, set())
+    if changed is None or teacher_ids is None:
+        versions[table_name] = None
+    else:
+        changed.update(teacher_id for teacher_id in teacher_ids if teacher_id is not None)
+        versions[table_name] = changed
+
+
+# 工作量表的记录被修改时登记数据版本
+def version_row_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        mark_versions_changed(session, mapper.local_table.name, _changed_teacher_ids(target))
+
+
+# 按数据库方言生成“版本号加一，不存在则插入”的语句
+def _bump_statement(connection, now):
+    table = DataVersion.__table__
+    dialect = connection.dialect.name
+    bumped = {'version': table.c.version + 1, 'updated_at': now}
+    if dialect == 'mysql':
+        return mysql.insert(table).on_duplicate_key_update(bumped)
+    if dialect in ('sqlite', 'postgresql'):
+        statement = (sqlite if dialect == 'sqlite' else postgresql).insert(table)
+        return statement.on_conflict_do_update(index_elements=['table_name', 'teacher_id'], set_=bumped)
+    return None
+
+
+# 提交前把本事务登记的变化写入数据版本表，与数据在同一事务中提交
+def write_data_versions(session):
+    # 先把未写入的对象flush出去，flush中登记的变化也要算上
+    session.flush()
+    versions = session.info.pop('versions_changed', None)
+    if not versions:
+        return
+    table = DataVersion.__table__
+    connection = session.connection()
+    # HTTP 的 Last-Modified 只精确到秒
+    now = datetime.utcnow().replace(microsecond=0)
+    statement = _bump_statement(connection, now)
+    # 按 (表, 教工号) 的顺序加锁，并发的事务不会互相等待对方已锁住的行而死锁
+    for table_name in sorted(versions):
+        teacher_ids = versions[table_name]
+        if teacher_ids is None:
+            # 全部教师：已有的版本都加一；再写入 '*' 一行，表中还没有任何版本时整张表的版本也会变化
+            connection.execute(update(table).where(table.c.table_name == table_name)
+                               .values(version=table.c.version + 1, updated_at=now))
+            teacher_ids = {ALL_TEACHERS}
+        rows = [{'table_name': table_name, 'teacher_id': teacher_id, 'version': 1, 'updated_at': now}
+                for teacher_id in sorted(teacher_ids)]
+        if statement is not None:
+            connection.execute(statement, rows)
+            continue
+        existing = set(connection.execute(select(table.c.teacher_id).where(
+            table.c.table_name == table_name, table.c.teacher_id.in_([row['teacher_id'] for row in rows]))).scalars())
+        if existing:
+            connection.execute(update(table).where(table.c.table_name == table_name, table.c.teacher_id.in_(existing))
+                               .values(version=table.c.version + 1, updated_at=now))
+        missing = [row for row in rows if row['teacher_id'] not in existing]
+        if missing:
+            connection.execute(insert(table), missing)
+
+
+def invalidate_changed_rankings(session):
+    if 'ranking_changed' in session.info:
+        invalidate_rankings(session.info.pop('ranking_changed'))
+
+
+# 直接修改排名表的记录时也要让缓存失效
+def ranking_row_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        mark_rankings_changed(session, _changed_teacher_ids(target))
+
+
+# 触发器监听
+for _model in RANKING_AGGREGATES:
+    db.event.listen(_model, 'after_insert', ranking_after_insert)
+    db.event.listen(_model, 'after_update', ranking_after_update)
+    db.event.listen(_model, 'after_delete', ranking_after_delete)
+    for _attr in _ranking_attrs(_model):
+        db.event.listen(getattr(_model, _attr), 'set', _keep_old_value, active_history=True)
+db.event.listen(Session, 'before_flush', load_deleted_rankings)
+db.event.listen(Session, 'after_flush', refresh_dirty_rankings)
+db.event.listen(Session, 'after_rollback', discard_dirty_rankings)
+db.event.listen(Session, 'after_commit', invalidate_changed_rankings)
+db.event.listen(Session, 'before_commit', write_data_versions)
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    db.event.listen(UndergraduateWorkloadTeacherRanking, _event, ranking_row_changed)
+    for _model in RANKING_AGGREGATES:
+        db.event.listen(_model, _event, version_row_changed)
@@ -0,0 +1,55 @@
+# 服务端导出：按块从服务端游标取行，边取边写成 csv 或 xlsx 发给浏览器，
+# 不在内存里保留整个查询结果，导出整学年的数据也只占用一块的内存
+import csv
+import io
+import tempfile
+from datetime import date
+
+from openpyxl import Workbook
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# 从临时文件发送 xlsx 时每次读取的字节数
+EXPORT_BLOCK_SIZE = 1 << 16
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(columns, chunks):
+    """逐块产出 csv 文本：第一块是带 BOM 的表头（Excel 打开中文不乱码），之后每块一批行，字段中的逗号、引号按 csv 规则转义"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield '\ufeff' + buffer.getvalue()
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+
+
+def iter_xlsx(title, columns, chunks):
+    """
+    xlsx 是 zip 格式，必须写完才能确定目录，先用 openpyxl 的 write_only 模式逐行写到临时文件，
+    再按块读出发送；写入过程中行数据不在内存里累积
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title[:31])
+    sheet.append(columns)
+    for rows in chunks:
+        for row in rows:
+            sheet.append(list(row))
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        for block in iter(lambda: f.read(EXPORT_BLOCK_SIZE), b''):
+            yield block
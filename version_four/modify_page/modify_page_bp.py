@@ -1,10 +1,15 @@
 # 导入蓝图
-from flask import Blueprint, render_template, request, redirect, url_for
+from datetime import date
+
+from urllib.parse import quote
+
+from flask import Blueprint, render_template, request, redirect, url_for, current_app, jsonify, abort, Response, \
+    stream_with_context
 from flask_login import login_required
 
-from version_four.models import CompetitionAward, DepartmentInternship, \
-    EducationalResearchProject, FirstClassCourse, PublicService, StudentResearch, TeachingAchievementAward, \
-    UndergraduateMentorshipSystem, UndergraduateThesi, UndergraduateWorkloadCourseRanking
+from version_four.conditional import conditional_response
+from version_four.modify_page.export import EXPORT_FORMATS, iter_csv, iter_xlsx
+from version_four.worksheets import WORKSHEETS, WORKSHEETS_BY_TABLE_NAME
 
 """
 实例化蓝图对象
@@ -15,89 +20,97 @@ from version_four.models import CompetitionAward, DepartmentInternship, \
 modify_page_blueprint = Blueprint('modify_page', __name__,template_folder='templates')
 
 
+# 每页条数：请求中的 limit，未指定时按配置 MODIFY_PAGE_SIZE，不超过 MODIFY_PAGE_SIZE_MAX
+def page_size():
+    default = current_app.config.get('MODIFY_PAGE_SIZE', 50)
+    limit = request.values.get('limit', default, type=int)
+    return max(1, min(limit, current_app.config.get('MODIFY_PAGE_SIZE_MAX', 500)))
+
+
+# 按请求中的表名、教工号、教师名称和游标查询一页，表名不对时返回None；
+# 表单提交和翻页链接都走这里，教工号和教师名称都不填时按主键顺序浏览整张表
+def query_page():
+    sheet = WORKSHEETS.get(request.values.get('worksheet'))
+    if sheet is None:
+        return None
+    filters = {'teacher_id': request.values.get('teacher_id'), 'teacher_name': request.values.get('teacher_name')}
+    limit = page_size()
+    # 游标无效时抛出 ValueError
+    results, previous, following = sheet.page(filters, request.values.get('after'), request.values.get('before'),
+                                              limit)
+    return {'sheet': sheet, 'filters': filters, 'limit': limit, 'results': results,
+            'previous_cursor': previous, 'next_cursor': following}
+
+
+# 查询某张表的 GET 请求按这张表（指定教工号时为这位教师在表中）的数据版本返回条件响应，数据没变时返回 304
+def conditional_page(render):
+    sheet = WORKSHEETS.get(request.values.get('worksheet'))
+    if request.method != 'GET' or sheet is None:
+        return render()
+    return conditional_response([sheet.model.__tablename__], request.values.get('teacher_id'), render)
+
+
 # 用蓝图注册路由
 @modify_page_blueprint.route("/modify_page/all", methods=['POST', 'GET'])
 @login_required
 def modify_page():
-    worksheet = request.form.get('worksheet')
-    # 获取用户输入的教工号和教师名称
-    teacher_id = request.form.get('teacher_id')
-    teacher_name = request.form.get('teacher_name')
-    table_name = None
+    return conditional_page(render_modify_page)
+
 
-    if worksheet == "NULL":
+def render_modify_page():
+    try:
+        page = query_page()
+    except ValueError as e:
+        abort(400, str(e))
+    if page is None:
         return render_template('modify_page.html')
-    elif worksheet == "undergraduate_workload_course_ranking":
-        table_name = "本科工作量课程排序表"
-        results = UndergraduateWorkloadCourseRanking.query.filter_by(teacher_id=teacher_id,
-                                                                     teacher_name=teacher_name).all()
-        result = [record.UndergraduateWorkloadCourseRanking_list(results) for record in results]
-        columns = ["学年", "学期", "自然年", "上下半年", "课程号", "教学班", "课程名称", "教工号", "教师名称",
-                   "研讨学时", "授课学时", "实验学时", "选课人数", "学生数量权重系数B", "课程类型系数A",
-                   "理论课总学时P1", "实验分组数", "实验课系数", "实验课总学时P2", "课程拆分占比（工程中心用）",
-                   "课程总学时"]
-        return render_template('modify_page.html', result=result[0], table_name=table_name, columns=columns)
-    elif worksheet == "undergraduate_thesis":
-        table_name = "毕业论文"
-        results = UndergraduateThesi.query.filter_by(teacher_id=teacher_id, teacher_name=teacher_name).all()
-        result = [record.UndergraduateThesi_list(results) for record in results]
-        columns = ["学生姓名", "学生学号", "学院", "专业", "专业号", "年级", "毕业论文题目", "毕业论文成绩",
-                   "毕业论文指导老师", "毕业论文指导老师工号"]
-        return render_template('modify_page.html', result=result[0], table_name=table_name, columns=columns)
-    elif worksheet == "department_internship":
-        table_name = "本科实习"
-        results = DepartmentInternship.query.filter_by(teacher_id=teacher_id, teacher_name=teacher_name).all()
-        result = [record.DepartmentInternship_list(results) for record in results]
-        columns = ["学生姓名", "学生学号", "专业", "年级", "学部内实习指导教师", "学部内实习指导教师工号", "实习周数"]
-        return render_template('modify_page.html', result=result[0], table_name=table_name, columns=columns)
-    elif worksheet == "competition_awards":
-        table_name = "学生竞赛"
-        results = CompetitionAward.query.filter_by(teacher_id=teacher_id, teacher_name=teacher_name).all()
-        result = [record.CompetitionAward_list(results) for record in results]
-        columns = ["序号", "赛事名称", "作品名称", "获奖类别", "获奖等级", "指导教师", "指导教师工号", "总工作量",
-                   "获奖年份"]
-        return render_template('modify_page.html', result=result[0], table_name=table_name, columns=columns)
-    elif worksheet == "student_research":
-        table_name = "学生科研"
-        results = StudentResearch.query.filter_by(teacher_id=teacher_id, teacher_name=teacher_name).all()
-        result = [record.StudentResearch_list(results) for record in results]
-        columns = ["序号", "项目名称", "级别", "负责人", "学号", "项目组总人数", "指导老师", "指导老师工号", "验收结果",
-                   "工作量"]
-        return render_template('modify_page.html', result=result[0], table_name=table_name, columns=columns)
-    elif worksheet == "undergraduate_mentorship_system":
-        table_name = "本科生导师制"
-        results = UndergraduateMentorshipSystem.query.filter_by(teacher_id=teacher_id,
-                                                                teacher_name=teacher_name).all()
-        result = [record.UndergraduateMentorshipSystem_list(results) for record in results]
-        columns = ["导师姓名", "教工号", "学生姓名", "年级", "学号", "教师工作量"]
-        return render_template('modify_page.html', result=result[0], table_name=table_name, columns=columns)
-    elif worksheet == "educational_research_project":
-        table_name = "教研项目"
-        results = EducationalResearchProject.query.filter_by(teacher_id=teacher_id, teacher_name=teacher_name).all()
-        result = [record.EducationalResearchProject_list(results) for record in results]
-        columns = ["序号", "项目名称", "项目负责人", "项目成员", "级别", "立项时间", "结项时间", "验收结论",
-                   "教师姓名", "工号", "教研项目工作量"]
-        return render_template('modify_page.html', result=result[0], table_name=table_name, columns=columns)
-    elif worksheet == "first_class_courses":
-        table_name = "一流课程"
-        results = FirstClassCourse.query.filter_by(teacher_id=teacher_id, teacher_name=teacher_name).all()
-        result = [record.FirstClassCourse_list(results) for record in results]
-        columns = ["序号", "课程性质", "内容", "负责人", "备注", "教师姓名", "工号", "一流课程工作量"]
-        return render_template('modify_page.html', result=result[0], table_name=table_name, columns=columns)
-    elif worksheet == "teaching_achievement_awards":
-        table_name = "教学成果奖"
-        results = TeachingAchievementAward.query.filter_by(teacher_id=teacher_id, teacher_name=teacher_name).all()
-        result = [record.TeachingAchievementAward_list(results) for record in results]
-        columns = ["序号", "届", "时间", "推荐成果名称", "成果主要完成人名称", "获奖类别", "获奖等级", "备注", "教师",
-                   "工号", "教学成果工作量"]
-        return render_template('modify_page.html', result=result[0], table_name=table_name, columns=columns)
-    elif worksheet == "public_services":
-        table_name = "公共服务"
-        results = PublicService.query.filter_by(teacher_id=teacher_id, teacher_name=teacher_name).all()
-        result = [record.PublicService_list(results) for record in results]
-        columns = ["序号", "日期", "内容", "姓名", "工作时长", "课时", "教师工号", "工作量"]
-        return render_template('modify_page.html', result=result[0], table_name=table_name, columns=columns)
-    return render_template('modify_page.html')
+    sheet = page['sheet']
+    return render_template('modify_page.html', result=sheet.serialize(page['results']), table_name=sheet.table_name,
+                           columns=sheet.columns, worksheet=sheet.key, filters=page['filters'], limit=page['limit'],
+                           previous_cursor=page['previous_cursor'], next_cursor=page['next_cursor'])
+
+
+# 按游标分页查询的接口：返回本页的行和前后两页的游标，翻到多深耗时都一样
+@modify_page_blueprint.route("/modify_page/rows")
+@login_required
+def modify_page_rows():
+    return conditional_page(render_modify_page_rows)
+
+
+def render_modify_page_rows():
+    try:
+        page = query_page()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if page is None:
+        return jsonify({'error': '未知的表'}), 400
+    sheet = page['sheet']
+    # 日期按 ISO 格式输出
+    rows = [[value.isoformat() if isinstance(value, date) else value for value in row]
+            for row in sheet.serialize(page['results'])]
+    return jsonify({'table_name': sheet.table_name, 'columns': sheet.columns, 'rows': rows,
+                    'limit': page['limit'], 'previous_cursor': page['previous_cursor'],
+                    'next_cursor': page['next_cursor']})
+
+
+# 按表名、教工号、教师名称导出全部筛选到的记录，format 为 csv 或 xlsx；边查询边发送，不经过页面表格
+@modify_page_blueprint.route("/modify_page/export")
+@login_required
+def export():
+    sheet = WORKSHEETS.get(request.args.get('worksheet'))
+    file_format = request.args.get('format', 'csv')
+    if sheet is None or file_format not in EXPORT_FORMATS:
+        abort(400)
+    filters = {'teacher_id': request.args.get('teacher_id'), 'teacher_name': request.args.get('teacher_name')}
+    chunks = sheet.iter_rows(filters, current_app.config.get('EXPORT_CHUNK_SIZE', 1000))
+    if file_format == 'csv':
+        body = (text.encode('utf-8') for text in iter_csv(sheet.columns, chunks))
+    else:
+        body = iter_xlsx(sheet.table_name, sheet.columns, chunks)
+    file_name = quote("%s.%s" % (sheet.table_name, file_format))
+    # 响应发送期间保持应用上下文，服务端游标才能继续取数据
+    return Response(stream_with_context(body), mimetype=EXPORT_FORMATS[file_format],
+                    headers={'Content-Disposition': "attachment; filename*=UTF-8''%s" % file_name})
 
 
 @modify_page_blueprint.route("/modify_page/update", methods=['POST', 'GET'])
@@ -107,46 +120,11 @@ def update():
         # 获取前端发送的 JSON 数据
         json_data = request.get_json()
         if json_data:
-            table_name = json_data["表名"]
-            if table_name == "本科工作量课程排序表":
-                UndergraduateWorkloadCourseRanking.update_UndergraduateWorkloadCourseRanking_list(json_data)
-                return render_template('modify_page.html')
-            elif table_name == "毕业论文":
-                UndergraduateThesi.update_UndergraduateThesi(json_data)
-                return render_template('modify_page.html')
-            elif table_name == "本科实习":
-                DepartmentInternship.update_DepartmentInternship(json_data)
-                return render_template('modify_page.html')
-            elif table_name == "学生竞赛":
-                # columns = ["序号", "赛事名称", "作品名称", "获奖类别", "获奖等级", "指导教师", "指导教师工号", "总工作量","获奖年份"]
-                CompetitionAward.update_CompetitionAward(json_data)
-                return render_template('modify_page.html')
-            elif table_name == "学生科研":
-                # columns = ["序号", "项目名称", "级别", "负责人", "学号", "项目组总人数", "指导老师", "指导老师工号", "验收结果","工作量"]
-                StudentResearch.update_StudentResearch(json_data)
-                return render_template('modify_page.html')
-            elif table_name == "本科生导师制":
-                # columns = ["导师姓名", "教工号", "学生姓名", "年级", "学号", "教师工作量"]
-                UndergraduateMentorshipSystem.update_UndergraduateMentorshipSystem(json_data)
-                return render_template('modify_page.html')
-            elif table_name == "教研项目":
-                # columns = ["序号", "项目名称", "项目负责人", "项目成员", "级别", "立项时间", "结项时间", "验收结论",
-                #                    "教师姓名", "工号", "教研项目工作量"]
-                EducationalResearchProject.update_EducationalResearchProject(json_data)
-                return render_template('modify_page.html')
-            elif table_name == "一流课程":
-                # columns = ["序号", "课程性质", "内容", "负责人", "备注", "教师姓名", "工号", "一流课程工作量"]
-                FirstClassCourse.update_FirstClassCourse(json_data)
-                return render_template('modify_page.html')
-            elif table_name == "教学成果奖":
-                # columns = ["序号", "届", "时间", "推荐成果名称", "成果主要完成人名称", "获奖类别", "获奖等级", "备注", "教师",
-                #   "工号", "教学成果工作量"]
-                TeachingAchievementAward.update_TeachingAchievementAward(json_data)
-                return render_template('modify_page.html')
-            elif table_name == "公共服务":
-                # columns = ["序号", "日期", "内容", "姓名", "工作时长", "课时", "教师工号"]
-                PublicService.update_PublicService(json_data)
-                return render_template('modify_page.html')
+            sheet = WORKSHEETS_BY_TABLE_NAME.get(json_data["表名"])
+            if sheet is not None and not sheet.update(json_data):
+                # 只修改已有的记录，主键列被改动时按新主键找不到原记录
+                return jsonify({'error': '记录不存在'}), 404
+            return render_template('modify_page.html')
         else:
             print("NO DATA")
         # 在这里处理接收到的 JSON 数据
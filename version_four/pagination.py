@@ -0,0 +1,64 @@
+# 键集分页：按主键排序，以上一页最后一行（或下一页第一行）的主键作为游标取相邻的一页，
+# 不使用 OFFSET，翻到多深都只按索引读取一页的行；游标是主键值的 JSON 经 base64 编码，页面只原样传回
+import base64
+import json
+
+from sqlalchemy import tuple_
+
+from version_four.database import db
+
+
+def encode_cursor(values):
+    data = json.dumps(list(values), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """解析游标，返回主键值列表，格式不对时抛出 ValueError"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8'))
+    except (ValueError, TypeError):
+        raise ValueError("无效的游标: %s" % cursor)
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("无效的游标: %s" % cursor)
+    return values
+
+
+# 主键在游标之后（reverse 为 True 时在游标之前），复合主键用行值比较 (a, b) > (x, y)
+def _seek(key_columns, values, reverse=False):
+    if len(key_columns) == 1:
+        return key_columns[0] < values[0] if reverse else key_columns[0] > values[0]
+    if reverse:
+        return tuple_(*key_columns) < tuple_(*values)
+    return tuple_(*key_columns) > tuple_(*values)
+
+
+def _cursor_of(row, key_names):
+    return encode_cursor(getattr(row, name) for name in key_names)
+
+
+def keyset_page(statement, key_names, after=None, before=None, limit=50):
+    """
+    statement 为已加好筛选条件、选出了主键各列的 select，按主键列 key_names 升序分页，
+    after/before 为游标，都不传时取第一页。返回 (本页的行, 上一页游标, 下一页游标)，
+    没有上一页或下一页时游标为 None。每页多取一行判断后面还有没有数据，不执行 COUNT
+    """
+    key_columns = [statement.selected_columns[name] for name in key_names]
+    reverse = before is not None
+    cursor = before if reverse else after
+    if cursor is not None:
+        statement = statement.where(_seek(key_columns, decode_cursor(cursor, len(key_columns)), reverse))
+    order = [column.desc() for column in key_columns] if reverse else list(key_columns)
+    rows = db.session.execute(statement.order_by(*order).limit(limit + 1)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if reverse:
+        rows.reverse()
+    if not rows:
+        return rows, None, None
+    # 往前翻时“后面还有”指的是更前面的页，往后翻时同理；带着游标翻过来的方向一定还有数据
+    has_previous = more if reverse else cursor is not None
+    has_next = cursor is not None if reverse else more
+    return (rows,
+            _cursor_of(rows[0], key_names) if has_previous else None,
+            _cursor_of(rows[-1], key_names) if has_next else None)
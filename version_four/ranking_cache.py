@@ -0,0 +1,176 @@
+# 教师排名查询缓存：按教工号缓存分析页面要显示的排名行，容量有限，最久未使用的先淘汰。
+# 每条缓存带着读取时这位教师在排名表中的数据版本（models.DataVersion），查询时版本不同即视为未命中，
+# 其他进程（别的 web 进程、命令行重算）提交的写入也能发现。
+# 本进程提交后还会立即删掉受影响教师的缓存（见 models 中的 mark_rankings_changed），及早释放内存。
+# 默认每个进程各自一份；配置 RANKING_CACHE_ADDRESS 后连接 flask ranking-cache-server 启动的本机缓存进程，
+# 多个 web 进程和后台导入进程共用一份缓存和失效
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.managers import BaseManager
+
+from flask import current_app, has_app_context
+
+
+class RankingCache(object):
+    """
+    线程安全的 LRU 缓存，值为 (数据版本, 某位教师的排名行)。
+    版本和排名行要在同一个事务中读取，缓存中的版本和行才是一致的
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, teacher_id, stamp):
+        """缓存的版本与 stamp 相同时返回排名行，否则返回 None 并丢弃过期的缓存"""
+        with self._lock:
+            entry = self._data.get(teacher_id)
+            if entry is None or entry[0] != stamp:
+                if entry is not None:
+                    del self._data[teacher_id]
+                    self.invalidations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(teacher_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, teacher_id, stamp, rows):
+        with self._lock:
+            if self.maxsize <= 0:
+                return False
+            self._data[teacher_id] = (stamp, rows)
+            self._data.move_to_end(teacher_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return True
+
+    def invalidate(self, teacher_ids):
+        """让这些教师的缓存失效，teacher_ids 为 None 时清空全部"""
+        with self._lock:
+            if teacher_ids is None:
+                self.invalidations += len(self._data)
+                self._data.clear()
+                return
+            for teacher_id in teacher_ids:
+                if self._data.pop(teacher_id, None) is not None:
+                    self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                    'size': len(self._data), 'maxsize': self.maxsize, 'invalidations': self.invalidations}
+
+
+class RankingCacheManager(BaseManager):
+    pass
+
+
+# 缓存进程里的那一份缓存
+_served = None
+
+
+def _served_cache():
+    return _served
+
+
+RankingCacheManager.register('cache', callable=_served_cache,
+                             exposed=('get', 'put', 'invalidate', 'stats'))
+
+
+def serve_ranking_cache(address, authkey, maxsize):
+    """在当前进程中运行共享缓存服务，直到进程结束"""
+    global _served
+    _served = RankingCache(maxsize)
+    manager = RankingCacheManager(address=address, authkey=authkey)
+    manager.get_server().serve_forever()
+
+
+_local = None
+_shared = {}
+# 连接失败的共享缓存地址及失败的时间，过了 RANKING_CACHE_RETRY 秒再重新连接
+_failed = {}
+_lock = threading.Lock()
+
+
+def _authkey(config):
+    return str(config.get('SECRET_KEY', '')).encode('utf-8')
+
+
+def get_ranking_cache():
+    """
+    按配置返回共享缓存的代理或本进程的缓存；共享缓存连不上时先用本进程的缓存，
+    过 RANKING_CACHE_RETRY 秒后再尝试连接，缓存进程比 web 进程晚启动也能用上
+    """
+    global _local
+    config = current_app.config if has_app_context() else {}
+    address = config.get('RANKING_CACHE_ADDRESS')
+    with _lock:
+        if address:
+            address = tuple(address)
+            failed_at = _failed.get(address)
+            retry = failed_at is None or time.monotonic() - failed_at >= config.get('RANKING_CACHE_RETRY', 30)
+            if address not in _shared and retry:
+                manager = RankingCacheManager(address=address, authkey=_authkey(config))
+                try:
+                    manager.connect()
+                    _shared[address] = manager.cache()
+                    _failed.pop(address, None)
+                except OSError:
+                    if has_app_context():
+                        current_app.logger.warning("连接排名缓存进程 %s 失败，使用本进程的缓存", address)
+                    _failed[address] = time.monotonic()
+            if address in _shared:
+                return _shared[address]
+        if _local is None:
+            _local = RankingCache(config.get('RANKING_CACHE_SIZE', 1024))
+        return _local
+
+
+# 共享缓存出错时丢掉这个代理，之后按 RANKING_CACHE_RETRY 重新连接
+def _discard(cache):
+    with _lock:
+        for address, proxy in list(_shared.items()):
+            if proxy is cache:
+                del _shared[address]
+                _failed[address] = time.monotonic()
+
+
+# 共享缓存进程退出或网络出错时抛出的异常，这时跳过缓存直接查数据库
+_CACHE_ERRORS = (OSError, EOFError)
+
+
+def cached_ranking_rows(teacher_id, stamp, load):
+    """取这位教师的排名行，stamp 为当前的数据版本；未命中时调用 load() 查询并放入缓存"""
+    cache = get_ranking_cache()
+    try:
+        rows = cache.get(teacher_id, stamp)
+        if rows is not None:
+            return rows
+    except _CACHE_ERRORS:
+        _discard(cache)
+        return load()
+    rows = load()
+    try:
+        cache.put(teacher_id, stamp, rows)
+    except _CACHE_ERRORS:
+        _discard(cache)
+    return rows
+
+
+def invalidate_rankings(teacher_ids):
+    """让这些教师的排名缓存失效，teacher_ids 为 None 时清空全部"""
+    cache = get_ranking_cache()
+    try:
+        cache.invalidate(None if teacher_ids is None else list(teacher_ids))
+    except _CACHE_ERRORS:
+        _discard(cache)
+        if has_app_context():
+            current_app.logger.exception("排名缓存失效失败")
@@ -0,0 +1,29 @@
+# 查询结果转二维列表的公共实现：每个结果集只调用一次，按给定字段顺序逐行取值，耗时与行数成正比。
+# 各表的 *_list 方法、工作量表登记表和分析页面都用它，不再各自手写取值循环
+import operator
+
+from sqlalchemy import Row
+
+
+def row_getter(attrs):
+    """按字段顺序一次取出一行各字段值的函数，返回元组"""
+    if len(attrs) == 1:
+        attr = attrs[0]
+        return lambda row: (getattr(row, attr),)
+    return operator.attrgetter(*attrs)
+
+
+def serialize_rows(results, attrs, getter=None):
+    """
+    把整个结果集转换成按 attrs 顺序排列的二维列表。results 可以是ORM对象，也可以是行元组；
+    行元组的列恰好就是 attrs 时直接转换，不再逐个取属性。getter 为 row_getter(attrs) 的结果，可预先算好传入
+    """
+    results = list(results)
+    if not results:
+        return []
+    first = results[0]
+    if isinstance(first, Row) and first._fields == tuple(attrs):
+        return [list(row) for row in results]
+    if getter is None:
+        getter = row_getter(attrs)
+    return [list(getter(result)) for result in results]
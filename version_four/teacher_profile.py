@@ -0,0 +1,58 @@
+# 教师工作量总览：一条 UNION ALL 查询一次取出某位教师在十张工作量表中的全部记录，按表分组返回，
+# 不再逐表提交十次查询。各表列数和类型不同，查询时统一转成字符串、补齐到最宽那张表的列数，
+# 并带上表序号；取回后再按各列的字段类型还原成数字
+from sqlalchemy import String, bindparam, cast, literal, null, select, union_all
+
+from version_four.database import db
+from version_four.worksheets import WORKSHEETS, column_kind
+
+# 查询语句只和登记表有关，第一次使用时生成
+_statement = None
+
+
+def profile_statement():
+    """十张表按教工号筛选后 UNION ALL 的查询，教工号为参数 teacher_id"""
+    global _statement
+    if _statement is None:
+        sheets = list(WORKSHEETS.values())
+        width = max(len(sheet.attrs) for sheet in sheets)
+        selects = []
+        for number, sheet in enumerate(sheets):
+            table = sheet.model.__table__
+            values = [cast(table.c[attr], String) for attr in sheet.attrs]
+            values += [cast(null(), String)] * (width - len(values))
+            selects.append(select(literal(number).label('sheet'),
+                                  *[value.label('c%d' % i) for i, value in enumerate(values)])
+                           .where(table.c.teacher_id == bindparam('teacher_id')))
+        _statement = union_all(*selects)
+    return _statement
+
+
+# 按字段类型还原取回的字符串，日期保持 ISO 格式的字符串
+def _convert(kind, value):
+    if value is None:
+        return None
+    if kind == 'integer':
+        return int(float(value))
+    if kind == 'number':
+        return float(value)
+    return value
+
+
+def load_teacher_profile(teacher_id):
+    """
+    一次查询取出这位教师在各表中的记录，返回 {表: {'table_name': 中文表名, 'columns': 列名, 'rows': 二维列表}}，
+    没有记录的表 rows 为空列表；每张表内按主键排序
+    """
+    sheets = list(WORKSHEETS.values())
+    kinds = [[column_kind(sheet.model.__table__.c[attr].type) for attr in sheet.attrs] for sheet in sheets]
+    grouped = [[] for _ in sheets]
+    for row in db.session.execute(profile_statement(), {'teacher_id': teacher_id}):
+        number = row[0]
+        grouped[number].append([_convert(kind, value) for kind, value in zip(kinds[number], row[1:])])
+    profile = {}
+    for sheet, rows in zip(sheets, grouped):
+        keys = [sheet.columns.index(column) for column in sheet.key_columns]
+        rows.sort(key=lambda row: [(row[i] is not None, row[i]) for i in keys])
+        profile[sheet.key] = {'table_name': sheet.table_name, 'columns': sheet.columns, 'rows': rows}
+    return profile
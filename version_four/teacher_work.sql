@@ -53,6 +53,22 @@ CREATE TABLE `competition_awards`  (
 -- Records of competition_awards
 -- ----------------------------
 
+-- ----------------------------
+-- Table structure for data_version
+-- ----------------------------
+DROP TABLE IF EXISTS `data_version`;
+CREATE TABLE `data_version`  (
+  `table_name` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '表名',
+  `teacher_id` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL COMMENT '教工号',
+  `version` int NOT NULL COMMENT '版本号',
+  `updated_at` datetime NOT NULL COMMENT '最后修改时间',
+  PRIMARY KEY (`table_name`, `teacher_id`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+
+-- ----------------------------
+-- Records of data_version
+-- ----------------------------
+
 -- ----------------------------
 -- Table structure for department_internship
 -- ----------------------------
@@ -0,0 +1,241 @@
+# 批量导入：把json_data_list按批次写成多行INSERT，整个上传在一个事务里完成
+import pandas as pd
+from flask import current_app
+from sqlalchemy import bindparam, insert, select, tuple_, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.sql import sqltypes
+
+from version_four.database import db
+from version_four.models import deferred_rankings
+from version_four.worksheets import WORKSHEETS
+
+
+# 表格里的空单元格读出来是NaN/NaT，写库前统一换成None
+def clean_value(value):
+    if value is None or isinstance(value, str):
+        return value
+    return None if pd.isna(value) else value
+
+
+# 把一条json_data转换成以数据库字段为键的行，字符串字段（如工号、学号）统一转成字符串
+def record_to_row(json_data, fields, string_fields=()):
+    row = {field: clean_value(json_data[column]) for column, field in fields.items()}
+    for field in string_fields:
+        value = row[field]
+        if value is not None and not isinstance(value, str):
+            row[field] = str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+    return row
+
+
+def stream_import(worksheet, chunks, batch_size=None, progress=None):
+    """
+    把分块到来的记录依次写入一张表，每块写完即释放，内存占用只和块大小有关；
+    全部块在同一个事务里，任何一批失败则整个上传回滚。
+    progress(块序号, 本块行数, 累计行数) 在每块写入后调用，返回累计插入的行数
+    """
+    sheet = WORKSHEETS[worksheet]
+    model, fields, string_fields = sheet.model, sheet.fields, sheet.string_fields
+    if batch_size is None:
+        batch_size = current_app.config.get('IMPORT_BATCH_SIZE', 1000)
+    statement = insert(model.__table__)
+    total = 0
+    # 导入期间暂停逐行维护排名表，提交时只重算受影响的教师
+    with deferred_rankings() as rankings:
+        for number, json_data_list in enumerate(chunks, start=1):
+            rows = [record_to_row(json_data, fields, string_fields) for json_data in json_data_list]
+            for start in range(0, len(rows), batch_size):
+                # 传入多行参数时会生成 INSERT ... VALUES (...), (...) 的多行插入
+                db.session.execute(statement, rows[start:start + batch_size])
+            # Core 批量插入不经过ORM监听器，需要自己登记受影响的教师
+            rankings.touch(model, (row["teacher_id"] for row in rows))
+            total += len(rows)
+            if progress is not None:
+                progress(number, len(rows), total)
+    return total
+
+
+def bulk_import(worksheet, json_data_list, batch_size=None):
+    """按批次多行插入一张表的全部记录，任何一批失败则整个上传回滚，返回插入的行数"""
+    return stream_import(worksheet, [json_data_list], batch_size)
+
+
+# 按数据库字段类型把值转换成可比较的形式，文件里读出的值和数据库里取出的值才能直接比较
+def normalize_value(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, sqltypes.String):
+        # 纯数字的编号从表格里读出来可能是 2021001.0
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value)
+    if isinstance(column.type, (sqltypes.Numeric, sqltypes.Integer)):
+        try:
+            return round(float(value), 6)
+        except (TypeError, ValueError):
+            return str(value)
+    return str(value)
+
+
+# 按主键取出数据库中已有的行，返回 {主键: 行}
+def fetch_existing_rows(table, keys):
+    key_columns = list(table.primary_key.columns)
+    if not keys:
+        return {}
+    if len(key_columns) == 1:
+        condition = key_columns[0].in_([key[0] for key in keys])
+    else:
+        condition = tuple_(*key_columns).in_(keys)
+    existing = {}
+    for row in db.session.execute(select(table).where(condition)).mappings():
+        existing[tuple(normalize_value(column, row[column.name]) for column in key_columns)] = row
+    return existing
+
+
+# 按数据库方言生成“存在则更新，不存在则插入”的语句，方言不支持时返回None
+def upsert_statement(table, fields):
+    keys = [column.name for column in table.primary_key.columns]
+    updates = [field for field in fields if field not in keys]
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        statement = mysql.insert(table)
+        # INSERT ... ON DUPLICATE KEY UPDATE
+        return statement.on_duplicate_key_update({field: statement.inserted[field] for field in updates})
+    if dialect in ('sqlite', 'postgresql'):
+        statement = (sqlite if dialect == 'sqlite' else postgresql).insert(table)
+        return statement.on_conflict_do_update(index_elements=keys,
+                                               set_={field: statement.excluded[field] for field in updates})
+    return None
+
+
+# 不支持 upsert 的数据库：新行多行插入，已有的行按主键逐行更新
+def _write_changed(table, fields, inserted, updated):
+    if inserted:
+        db.session.execute(insert(table), inserted)
+    if updated:
+        keys = [column.name for column in table.primary_key.columns]
+        statement = update(table).where(*[table.c[key] == bindparam('key_' + key) for key in keys])
+        # 参数中除主键外的字段即 SET 的字段
+        db.session.execute(statement, [dict({field: row[field] for field in fields if field not in keys},
+                                            **{'key_' + key: row[key] for key in keys}) for row in updated])
+
+
+# 按字段类型规范化后对整行取哈希，文件中的行和数据库中的行哈希相同即内容相同
+def row_digest(columns, row):
+    return hash(tuple(normalize_value(column, row[column.name]) for column in columns))
+
+
+def compare_batch(table, columns, rows):
+    """
+    按主键一次取出这批行在数据库中的现有内容，逐行比较哈希，
+    产出 (行, 数据库中的原有行或None, 内容是否有变化)
+    """
+    key_columns = list(table.primary_key.columns)
+    keys = [tuple(normalize_value(column, row[column.name]) for column in key_columns) for row in rows]
+    existing = fetch_existing_rows(table, [key for key in set(keys) if None not in key])
+    for key, row in zip(keys, rows):
+        old = existing.get(key)
+        yield row, old, old is None or row_digest(columns, row) != row_digest(columns, old)
+
+
+def stream_upsert(worksheet, chunks, batch_size=None, progress=None):
+    """
+    按主键批量写入：不存在的行插入，已存在且内容有变化的行更新，内容相同的行跳过。
+    每批先按主键一次取出已有行做比较，再执行一条多行 INSERT ... ON DUPLICATE KEY UPDATE
+    （数据库不支持时分别插入新行、按主键更新已有的行）；
+    全部块在同一个事务里，返回 {'inserted': 插入行数, 'updated': 更新行数, 'unchanged': 未变行数}
+    """
+    sheet = WORKSHEETS[worksheet]
+    model, fields, string_fields = sheet.model, sheet.fields, sheet.string_fields
+    if batch_size is None:
+        batch_size = current_app.config.get('IMPORT_BATCH_SIZE', 1000)
+    table = model.__table__
+    field_columns = [table.c[field] for field in sheet.attrs]
+    statement = upsert_statement(table, sheet.attrs)
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    total = 0
+    with deferred_rankings() as rankings:
+        for number, json_data_list in enumerate(chunks, start=1):
+            rows = [record_to_row(json_data, fields, string_fields) for json_data in json_data_list]
+            for start in range(0, len(rows), batch_size):
+                inserted, updated = [], []
+                for row, old, modified in compare_batch(table, field_columns, rows[start:start + batch_size]):
+                    if old is None:
+                        counts['inserted'] += 1
+                        inserted.append(row)
+                    elif not modified:
+                        counts['unchanged'] += 1
+                        continue
+                    else:
+                        counts['updated'] += 1
+                        updated.append(row)
+                        # 改了指导教师时，原来那位教师的统计也要重算
+                        rankings.touch(model, [old["teacher_id"]])
+                    rankings.touch(model, [row["teacher_id"]])
+                if statement is None:
+                    _write_changed(table, sheet.attrs, inserted, updated)
+                elif inserted or updated:
+                    db.session.execute(statement, inserted + updated)
+            total += len(rows)
+            if progress is not None:
+                progress(number, len(rows), total)
+    return counts
+
+
+def stream_diff(worksheet, chunks, batch_size=None, progress=None, limit=None):
+    """
+    试导入：和 stream_upsert 一样每批按主键一次取出已有行比较，但不写库。
+    返回 {'inserted': 新增行数, 'updated': 更新行数, 'unchanged': 未变行数, 'changes': 变化明细}，
+    明细最多 limit 条（默认按配置 IMPORT_DIFF_LIMIT），每条为
+    {'action': 'insert'/'update', 'key': {主键列名: 值}, 'fields': {列名: {'old': 原值, 'new': 新值}}}
+    """
+    sheet = WORKSHEETS[worksheet]
+    fields, string_fields = sheet.fields, sheet.string_fields
+    if batch_size is None:
+        batch_size = current_app.config.get('IMPORT_BATCH_SIZE', 1000)
+    if limit is None:
+        limit = current_app.config.get('IMPORT_DIFF_LIMIT', 1000)
+    table = sheet.model.__table__
+    field_columns = [table.c[field] for field in sheet.attrs]
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'changes': []}
+    changes = counts['changes']
+    total = 0
+    for number, json_data_list in enumerate(chunks, start=1):
+        rows = [record_to_row(json_data, fields, string_fields) for json_data in json_data_list]
+        for start in range(0, len(rows), batch_size):
+            for row, old, modified in compare_batch(table, field_columns, rows[start:start + batch_size]):
+                if not modified:
+                    counts['unchanged'] += 1
+                    continue
+                counts['inserted' if old is None else 'updated'] += 1
+                if len(changes) >= limit:
+                    continue
+                # 只有哈希不同的行才逐列比较，找出变化的列
+                values = {column: normalize_value(table.c[attr], row[attr]) for column, attr in fields.items()}
+                if old is None:
+                    changed = {column: {'old': None, 'new': value} for column, value in values.items()}
+                else:
+                    changed = {}
+                    for column, attr in fields.items():
+                        old_value = normalize_value(table.c[attr], old[attr])
+                        if values[column] != old_value:
+                            changed[column] = {'old': old_value, 'new': values[column]}
+                changes.append({'action': 'insert' if old is None else 'update',
+                                'key': {column: values[column] for column in sheet.key_columns},
+                                'fields': changed})
+        total += len(rows)
+        if progress is not None:
+            progress(number, len(rows), total)
+    return counts
+
+
+def import_chunks(worksheet, chunks, mode='insert', batch_size=None, progress=None):
+    """
+    按导入方式写入，'insert' 只插入，'upsert' 按主键插入或更新，
+    'diff' 只和数据库比较、不写库（见 stream_diff），返回各类行数
+    """
+    if mode == 'upsert':
+        return stream_upsert(worksheet, chunks, batch_size, progress)
+    if mode == 'diff':
+        return stream_diff(worksheet, chunks, batch_size, progress)
+    total = stream_import(worksheet, chunks, batch_size, progress)
+    return {'inserted': total, 'updated': 0, 'unchanged': 0}
@@ -0,0 +1,131 @@
+# 后台导入任务：上传请求只负责读出文件内容并提交任务，解析和写库在本地的线程池/进程池中完成
+import io
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from version_four.database import db
+from version_four.ranking_cache import invalidate_rankings
+
+# 执行器与任务状态表在第一次提交任务时按配置创建
+_executor = None
+_jobs = None
+_lock = threading.Lock()
+
+
+# 进程池中的每个子进程启动时调用，丢弃从父进程继承来的数据库连接
+def _init_worker_process():
+    from version_four.app import app  # 子进程里自己加载应用，放在函数内避免循环导入
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def _get_executor(app):
+    global _executor, _jobs
+    with _lock:
+        if _executor is None:
+            workers = app.config.get('IMPORT_JOB_WORKERS', 2)
+            if app.config.get('IMPORT_JOB_EXECUTOR', 'thread') == 'process':
+                # 进程之间通过 Manager 共享任务状态，不需要额外的消息队列服务
+                _jobs = multiprocessing.Manager().dict()
+                _executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker_process)
+            else:
+                _jobs = {}
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='import-job')
+        return _executor, _jobs
+
+
+# 只保留最近的若干个已结束任务
+def _prune_jobs(jobs, keep):
+    finished = [job for job in jobs.values() if job['status'] in ('done', 'failed')]
+    if len(finished) > keep:
+        finished.sort(key=lambda job: job['created_at'])
+        for job in finished[:len(finished) - keep]:
+            jobs.pop(job['id'], None)
+
+
+def submit_import_job(app, data, worksheet, mode='insert', extension='.csv', on_finish=None):
+    """
+    提交一个导入任务，data 为上传文件的内容，extension 为文件类型，立即返回任务编号；
+    on_finish(任务状态) 在任务结束后于当前进程中调用
+    """
+    executor, jobs = _get_executor(app)
+    job_id = uuid.uuid4().hex
+    jobs[job_id] = {
+        'id': job_id,
+        'worksheet': worksheet,
+        'status': 'queued',
+        'chunks': 0,
+        'rows': 0,
+        'rows_per_second': 0.0,
+        'mode': mode,
+        'counts': None,
+        'errors': [],
+        'row_errors': None,
+        'created_at': time.time(),
+        'started_at': None,
+        'finished_at': None,
+        'elapsed': None,
+    }
+    _prune_jobs(jobs, app.config.get('IMPORT_JOB_HISTORY', 100))
+    # 进程池的子进程自己加载应用，线程池直接使用当前应用
+    worker_app = None if isinstance(executor, ProcessPoolExecutor) else app
+    future = executor.submit(run_import_job, job_id, data, worksheet, mode, jobs, worker_app, extension)
+    if worker_app is None and not app.config.get('RANKING_CACHE_ADDRESS'):
+        # 子进程提交后只能让它自己的排名缓存失效，没有共享缓存进程时任务结束后清空本进程的缓存
+        future.add_done_callback(lambda done: invalidate_rankings(None))
+    if on_finish is not None:
+        future.add_done_callback(lambda done: on_finish(done.result()))
+    return job_id
+
+
+def get_job(job_id):
+    """查询任务状态，任务不存在时返回None"""
+    if _jobs is None:
+        return None
+    job = _jobs.get(job_id)
+    return dict(job) if job is not None else None
+
+
+def run_import_job(job_id, data, worksheet, mode, jobs, app=None, extension='.csv'):
+    # 放在函数内导入，避免与 upload_page_bp 循环导入
+    from version_four.upload_page.upload_page_bp import iter_worksheet_chunks, import_workbook, WORKBOOK
+    from version_four.upload_page.bulk_import import import_chunks
+    if app is None:
+        from version_four.app import app
+
+    # 任务状态每次整体写回，Manager 的字典代理才能感知到变化
+    state = dict(jobs[job_id])
+    state.update(status='running', started_at=time.time())
+    jobs[job_id] = dict(state)
+
+    def progress(number, chunk_rows, total_rows):
+        elapsed = time.time() - state['started_at']
+        state.update(chunks=number, rows=total_rows,
+                     rows_per_second=round(total_rows / elapsed, 1) if elapsed > 0 else 0.0)
+        jobs[job_id] = dict(state)
+
+    try:
+        with app.app_context():
+            if worksheet == WORKBOOK:
+                # 整个工作簿导入时 counts 按表分别统计
+                state['counts'], state['skipped_sheets'] = import_workbook(
+                    io.BytesIO(data), mode, app.config.get('IMPORT_BATCH_SIZE'), progress=progress)
+            else:
+                chunks = iter_worksheet_chunks(io.BytesIO(data), worksheet, app.config.get('IMPORT_CHUNK_SIZE', 10000),
+                                               extension=extension)
+                state['counts'] = import_chunks(worksheet, chunks, mode, app.config.get('IMPORT_BATCH_SIZE'),
+                                                progress=progress)
+        state['status'] = 'done'
+    except Exception as e:
+        state['errors'] = state['errors'] + [str(e)]
+        # 校验不通过时附上逐行的错误报告
+        state['row_errors'] = getattr(e, 'errors', None)
+        state['status'] = 'failed'
+    finally:
+        state['finished_at'] = time.time()
+        state['elapsed'] = round(state['finished_at'] - state['started_at'], 3)
+        jobs[job_id] = dict(state)
+    return state
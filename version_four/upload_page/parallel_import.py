@@ -0,0 +1,125 @@
+# 多表并行导入：各工作表在进程池里分块解析和校验，解析好的块经队列送回当前进程，
+# 由唯一的写库循环按到达顺序写入。解析和校验是吃CPU的pandas计算，按核数并行；
+# 写库只有一个连接、一个事务，任何一张表出错整个工作簿回滚
+import io
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+
+from version_four.models import deferred_rankings
+from version_four.upload_page.bulk_import import import_chunks
+from version_four.upload_page.readers import XlsxReader
+from version_four.upload_page.validation import ValidationError, validate_frame
+
+# 子进程把解析好的块放进这个队列，在进程启动时传入
+_results = None
+
+
+def _init_worker(results):
+    global _results
+    _results = results
+
+
+def parse_sheet(source, worksheet, sheet_name, chunk_size, engine, validate, teacher_ids):
+    """
+    在子进程中分块读取并校验一张工作表，每块以 ('chunk', 表, DataFrame) 送回队列，
+    最后送回 ('done', 表, 错误列表)。出现错误后不再送回数据，只把剩下的块校验完
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    errors = []
+    seen_keys = set()
+    try:
+        with XlsxReader(source, engine) as reader:
+            for df in reader.iter_frames(chunk_size, sheet_name):
+                if validate:
+                    df, chunk_errors = validate_frame(df, worksheet, teacher_ids, seen_keys)
+                    errors.extend(chunk_errors)
+                if not errors:
+                    _results.put(('chunk', worksheet, df))
+    except ValidationError as e:
+        # 缺少列，后面的块不用再看
+        errors.extend(e.errors)
+    finally:
+        _results.put(('done', worksheet, errors))
+
+
+def _check_workers(futures):
+    for future in futures:
+        if future.done() and future.exception() is not None:
+            raise future.exception()
+
+
+def import_workbook_parallel(source, sheets, workers, mode='insert', batch_size=None, progress=None,
+                             chunk_size=10000, engine=None, validate=True, teacher_ids=None):
+    """
+    sheets 为 {表: 工作表名}，source 为文件路径或文件内容（bytes）。
+    返回 {表: {'inserted': 插入行数, 'updated': 更新行数, 'unchanged': 未变行数}}，校验不通过时抛出 ValidationError；
+    mode 为 'diff' 时每张表还有 'changes' 变化明细，合并各块后最多 IMPORT_DIFF_LIMIT 条
+    """
+    # 放在函数内导入，避免与 upload_page_bp 循环导入
+    from version_four.upload_page.upload_page_bp import frame_to_records
+
+    results = {worksheet: {'inserted': 0, 'updated': 0, 'unchanged': 0} for worksheet in sheets}
+    if mode == 'diff':
+        limit = current_app.config.get('IMPORT_DIFF_LIMIT', 1000)
+        for counts in results.values():
+            counts['changes'] = []
+    errors = []
+    pending = set(sheets)
+    number = 0
+    total = 0
+    # 用 spawn 启动子进程，不在多线程的 web 进程里 fork
+    context = multiprocessing.get_context('spawn')
+    # 限制排队的块数，解析快于写库时内存不会无限增长
+    chunks = context.Queue(maxsize=workers * 2)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(chunks,)) as executor:
+        futures = [executor.submit(parse_sheet, source, worksheet, sheet_name, chunk_size, engine, validate,
+                                   teacher_ids) for worksheet, sheet_name in sheets.items()]
+        try:
+            with deferred_rankings():
+                while pending:
+                    _check_workers(futures)
+                    try:
+                        kind, worksheet, payload = chunks.get(timeout=1)
+                    except queue.Empty:
+                        continue
+                    if kind == 'done':
+                        pending.discard(worksheet)
+                        errors.extend(payload)
+                        continue
+                    # 已经有表校验出错时不再写库，等各进程把剩下的块校验完
+                    if errors:
+                        continue
+                    counts = import_chunks(worksheet, [frame_to_records(payload, worksheet)], mode, batch_size)
+                    for key, value in counts.items():
+                        if key == 'changes':
+                            changes = results[worksheet]['changes']
+                            changes.extend(value[:max(0, limit - len(changes))])
+                        else:
+                            results[worksheet][key] += value
+                    number += 1
+                    total += len(payload)
+                    if progress is not None:
+                        progress(number, len(payload), total)
+                if errors:
+                    raise ValidationError(errors)
+        except BaseException:
+            # 子进程可能正阻塞在放入队列上，取空队列让它们结束，进程池才能关闭
+            while not all(future.done() for future in futures):
+                try:
+                    chunks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            raise
+    return results
+
+
+def parse_workers(setting, sheet_count):
+    """按配置 IMPORT_PARSE_WORKERS 和工作表数确定进程数，None 表示按CPU核数"""
+    workers = setting if setting is not None else (os.cpu_count() or 1)
+    return max(1, min(workers, sheet_count))
@@ -0,0 +1,161 @@
+# 导入文件读取：csv 交给 pandas；xlsx 用只读引擎逐行流式读取，不载入样式等整个工作簿结构
+import os
+import threading
+from datetime import date
+
+import pandas as pd
+from flask import current_app, has_app_context
+
+try:
+    # Rust 实现的只读表格解析器，可选依赖（pip install python-calamine）
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+# 支持的 xlsx 读取引擎，'auto' 时按顺序选第一个已安装的
+XLSX_ENGINES = ('calamine', 'openpyxl')
+
+
+def xlsx_engine(engine=None):
+    """确定 xlsx 读取引擎，未指定时使用配置 XLSX_READER"""
+    if engine is None:
+        engine = current_app.config.get('XLSX_READER', 'auto') if has_app_context() else 'auto'
+    if engine == 'auto':
+        return 'calamine' if CalamineWorkbook is not None else 'openpyxl'
+    if engine not in XLSX_ENGINES:
+        raise ValueError("不支持的xlsx读取引擎: %s" % engine)
+    if engine == 'calamine' and CalamineWorkbook is None:
+        raise ImportError("未安装 python-calamine，无法使用 calamine 引擎")
+    return engine
+
+
+# calamine 的空单元格是空字符串、日期是 date，统一成与 openpyxl 引擎相同的值
+def _calamine_value(value):
+    if value == '':
+        return None
+    if isinstance(value, date):
+        return pd.Timestamp(value)
+    return value
+
+
+# 整行都是空单元格（calamine 读出来是空字符串）
+def _is_blank(row):
+    return all(value is None or value == '' for value in row)
+
+
+class XlsxReader:
+    """
+    只打开一次的 xlsx 工作簿，按行流式读取各工作表。
+    sheet 可以是工作表序号或名称，第一行非空行作为表头
+    """
+
+    def __init__(self, source, engine=None):
+        self.engine = xlsx_engine(engine)
+        # calamine 的工作簿对象不能在多个线程里同时取工作表
+        self._lock = threading.Lock()
+        if self.engine == 'calamine':
+            if isinstance(source, str):
+                self.workbook = CalamineWorkbook.from_path(source)
+            else:
+                self.workbook = CalamineWorkbook.from_filelike(source)
+        else:
+            from openpyxl import load_workbook
+            # 只读模式按需解析单元格值，不构建样式和整张表的单元格对象
+            self.workbook = load_workbook(source, read_only=True, data_only=True)
+
+    @property
+    def sheet_names(self):
+        if self.engine == 'calamine':
+            return list(self.workbook.sheet_names)
+        return list(self.workbook.sheetnames)
+
+    def iter_rows(self, sheet=0):
+        """逐行产出单元格值的元组，空单元格为None，整行为空的行跳过"""
+        if self.engine == 'calamine':
+            with self._lock:
+                if isinstance(sheet, int):
+                    worksheet = self.workbook.get_sheet_by_index(sheet)
+                else:
+                    worksheet = self.workbook.get_sheet_by_name(sheet)
+            rows = worksheet.iter_rows()
+        else:
+            worksheet = self.workbook.worksheets[sheet] if isinstance(sheet, int) else self.workbook[sheet]
+            rows = worksheet.iter_rows(values_only=True)
+        for row in rows:
+            if _is_blank(row):
+                continue
+            if self.engine == 'calamine':
+                row = tuple(_calamine_value(value) for value in row)
+            yield row
+
+    def iter_frames(self, chunk_size, sheet=0):
+        """每次产出 chunk_size 行的 DataFrame，内存占用只和块大小有关"""
+        rows = self.iter_rows(sheet)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [value if value is not None else "Unnamed: %d" % i for i, value in enumerate(header)]
+        chunk = []
+        start = 0
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield _to_frame(chunk, columns, start)
+                start += len(chunk)
+                chunk = []
+        if chunk:
+            yield _to_frame(chunk, columns, start)
+
+    def read(self, sheet=0):
+        """读出整张工作表"""
+        frames = list(self.iter_frames(float('inf'), sheet))
+        return frames[0] if frames else pd.DataFrame()
+
+    def close(self):
+        self.workbook.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+# 把若干行转换成DataFrame，行宽与表头不一致时截断或补None；行索引接着上一块编号，与 read_csv 分块一致
+def _to_frame(rows, columns, start=0):
+    width = len(columns)
+    rows = [row if len(row) == width else tuple(row[:width]) + (None,) * (width - len(row)) for row in rows]
+    return pd.DataFrame.from_records(rows, columns=columns, index=pd.RangeIndex(start, start + len(rows)))
+
+
+# 文件类型：source 是路径时取后缀名，是上传的文件流时由调用方传入 extension
+def _extension(source, extension=None):
+    if extension is None:
+        extension = os.path.splitext(source)[1] if isinstance(source, str) else ''
+    extension = extension.lower()
+    return extension if extension.startswith('.') else '.' + extension
+
+
+def read_table(source, engine=None, extension=None):
+    """读取整个csv文件或xlsx文件的第一张工作表为DataFrame，source 可以是路径或文件流"""
+    extension = _extension(source, extension)
+    if extension == '.csv':
+        return pd.read_csv(source)
+    if extension == '.xlsx':
+        with XlsxReader(source, engine) as reader:
+            return reader.read()
+    raise ValueError("不支持的文件类型: %s" % extension)
+
+
+def iter_table_chunks(source, chunk_size, engine=None, extension=None):
+    """分块读取csv文件或xlsx文件的第一张工作表，每次产出 chunk_size 行的 DataFrame，source 可以是路径或文件流"""
+    extension = _extension(source, extension)
+    if extension == '.csv':
+        with pd.read_csv(source, chunksize=chunk_size) as reader:
+            yield from reader
+    elif extension == '.xlsx':
+        with XlsxReader(source, engine) as reader:
+            yield from reader.iter_frames(chunk_size)
+    else:
+        raise ValueError("不支持的文件类型: %s" % extension)
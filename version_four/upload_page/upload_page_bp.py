@@ -1,12 +1,18 @@
 # 导入蓝图
 import os
-import pandas as pd
-from flask import Blueprint, render_template, request, current_app, flash, redirect, url_for
-from flask_login import login_required
-from version_four.models import CompetitionAward, DepartmentInternship, \
-    EducationalResearchProject, FirstClassCourse, PublicService, StudentResearch, TeachingAchievementAward, \
-    UndergraduateMentorshipSystem, UndergraduateThesi, UndergraduateWorkloadCourseRanking
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, render_template, request, current_app, flash, redirect, url_for, jsonify, \
+    has_app_context
+from flask_login import login_required, current_user
+from version_four.models import deferred_rankings
 from version_four.Config import Config
+from version_four.upload_page.bulk_import import bulk_import, import_chunks
+from version_four.upload_page.import_jobs import submit_import_job, get_job
+from version_four.upload_page.upload_store import get_store, content_digest, count_rows
+from version_four.upload_page.parallel_import import import_workbook_parallel, parse_workers
+from version_four.upload_page.readers import XlsxReader, read_table, iter_table_chunks, xlsx_engine
+from version_four.upload_page.validation import ValidationError, validate_frame, known_teacher_ids
+from version_four.worksheets import WORKSHEETS, WORKSHEETS_BY_TABLE_NAME, get_worksheet
 
 """
 实例化蓝图对象
@@ -24,231 +30,188 @@ if not os.path.exists(UPLOAD_FOLDER):
 # 允许上传的文件类型,表格类型
 ALLOWED_EXTENSIONS = {'csv', 'xlsx'}
 
+# 批量上传的导入方式，diff 为试导入：只和数据库现有内容比较，不写库
+IMPORT_MODES = {'insert', 'upsert', 'diff'}
+
+# 页面提示中最多展示的错误条数（flash 保存在 cookie 里，不能太长）
+FLASH_ERRORS = 20
+
 
 # 检查文件扩展名是否符合要求
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-# 处理csv后缀名的导入文件
-def analyse_worksheet(file_name, worksheet):
-    _, file_extension = os.path.splitext(file_name)  # 获取文件的后缀名部分
-    if file_extension.lower() == '.csv':
-        df = pd.read_csv(file_name)  # 读取CSV文件为DataFrame
-    elif file_extension.lower() == '.xlsx':
-        df = pd.read_excel(file_name)  # 读取Excel文件的指定工作表为DataFrame
-    if worksheet == "competition_awards":
-        json_data_list = []
-        for index, row in df.iterrows():
-            json_data = {
-                "序号": row["序号"],
-                "赛事名称": row["赛事名称"],
-                "作品名称": row["作品名称"],
-                "获奖类别": row["获奖类别"],
-                "获奖等级": row["获奖等级"],
-                "指导教师": row["指导教师"],
-                "指导教师工号": row["指导教师工号"],
-                "总工作量": row["总工作量"],
-                "获奖年份": row["获奖年份"]
-            }
-            json_data_list.append(json_data)
-        return json_data_list
-    elif worksheet == "department_internships":
-        json_data_list = []
-        for index, row in df.iterrows():
-            json_data = {
-                "学生姓名": row["学生姓名"],
-                "学生学号": row["学生学号"],
-                "专业": row["专业"],
-                "年级": row["年级"],
-                "学部内实习指导教师": row["学部内实习指导教师"],
-                "学部内实习指导教师工号": row["学部内实习指导教师工号"],
-                "实习周数": row["实习周数"]
-            }
-            json_data_list.append(json_data)
-        return json_data_list
-    elif worksheet == "educational_research_projects":
-        json_data_list = []
-        for index, row in df.iterrows():
-            json_data = {
-                "项目名称": row["项目名称"],
-                "项目负责人": row["项目负责人"],
-                "项目成员": row["项目成员"],
-                "级别": row["级别"],
-                "立项时间": row["立项时间"],
-                "结项时间": row["结项时间"],
-                "验收结论": row["验收结论"],
-                "教师姓名": row["教师姓名"],
-                "工号": row["工号"],
-                "教研项目工作量": row["教研项目工作量"]
-            }
-            json_data_list.append(json_data)
-        return json_data_list
-    elif worksheet == "first_class_courses":
-        json_data_list = []
-        for index, row in df.iterrows():
-            json_data = {
-                "序号": row["序号"],
-                "课程性质": row["课程性质"],
-                "内容": row["内容"],
-                "负责人": row["负责人"],
-                "备注": row["备注"],
-                "教师姓名": row["教师姓名"],
-                "工号": row["工号"],
-                "一流课程工作量": row["一流课程工作量"]
-            }
-            json_data_list.append(json_data)
-        return json_data_list
-    elif worksheet == "public_service":
-        json_data_list = []
-        for index, row in df.iterrows():
-            json_data = {
-                "课程名称": row["课程名称"],
-                "课程代码": row["课程代码"],
-                "授课教师": row["授课教师"],
-                "上课时间": row["上课时间"],
-                "上课地点": row["上课地点"],
-                "课程类型": row["课程类型"],
-                "学分": row["学分"]
-            }
-            json_data_list.append(json_data)
-        return json_data_list
-    elif worksheet == "student_research":
-        json_data_list = []
-        for index, row in df.iterrows():
-            # 创建一个项目的JSON数据字典
-            json_data = {
-                "序号": row["序号"],
-                "项目名称": row["项目名称"],
-                "级别": row["级别"],
-                "负责人": row["负责人"],
-                "学号": row["学号"],
-                "项目组总人数": row["项目组总人数"],
-                "指导老师": row["指导老师"],
-                "指导老师工号": row["指导老师工号"],
-                "验收结果": row["验收结果"],
-                "工作量": row["工作量"]
-            }
-            json_data_list.append(json_data)
-        return json_data_list
-    elif worksheet == "teaching_achievement":
-        json_data_list = []
-        for index, row in df.iterrows():
-            # 创建一个项目的JSON数据字典
-            json_data = {
-                "序号": row["序号"],
-                "届": row["届"],
-                "时间": row["时间"],
-                "推荐成果名称": row["推荐成果名称"],
-                "成果主要完成人名称": row["成果主要完成人名称"],
-                "获奖类别": row["获奖类别"],
-                "获奖等级": row["获奖等级"],
-                "备注": row["备注"],
-                "教师": row["教师"],
-                "工号": row["工号"],
-                "教学成果工作量": row["教学成果工作量"]
-            }
-            json_data_list.append(json_data)
-        return json_data_list
-    elif worksheet == "undergraduate_mentorship_system":
-        json_data_list = []
-        for index, row in df.iterrows():
-            # 创建一个项目的JSON数据字典
-            json_data = {
-                "导师姓名": row["导师姓名"],
-                "教工号": row["教工号"],
-                "学生姓名": row["学生姓名"],
-                "年级": row["年级"],
-                "学号": row["学号"],
-                "教师工作量": row["教师工作量"]
-            }
-            json_data_list.append(json_data)
-        return json_data_list
-    elif worksheet == "undergraduate_thesis":
-        json_data_list = []
-        # 遍历数据框的每一行
-        for index, row in df.iterrows():
-            # 创建一个项目的JSON数据字典
-            json_data = {
-                "学生姓名": row["学生姓名"],
-                "学生学号": row["学生学号"],
-                "学院": row["学院"],
-                "专业": row["专业"],
-                "专业号": row["专业号"],
-                "年级": row["年级"],
-                "毕业论文题目": row["毕业论文题目"],
-                "毕业论文成绩": row["毕业论文成绩"],
-                "毕业论文指导老师": row["毕业论文指导老师"],
-                "毕业论文指导老师工号": row["毕业论文指导老师工号"]
-            }
-            # 将该项目的JSON数据字典添加到json_data_list中
-            json_data_list.append(json_data)
-        return json_data_list
-    elif worksheet == "undergraduate_workload_course_ranking":
-        json_data_list = []
-
-        # 遍历数据框的每一行
-        for index, row in df.iterrows():
-            # 创建一个项目的JSON数据字典
-            json_data = {
-                "学生姓名": row["学生姓名"],
-                "学生学号": row["学生学号"],
-                "学院": row["学院"],
-                "专业": row["专业"],
-                "专业号": row["专业号"],
-                "年级": row["年级"],
-                "毕业论文题目": row["毕业论文题目"],
-                "毕业论文成绩": row["毕业论文成绩"],
-                "毕业论文指导老师": row["毕业论文指导老师"],
-                "毕业论文指导老师工号": row["毕业论文指导老师工号"]
-            }
-            # 将该项目的JSON数据字典添加到json_data_list中
-            json_data_list.append(json_data)
-            return json_data_list
-
-
-# 处理好数据后直接导入
-def process_work(worksheet, json_data_list):
-    # 在这里对DataFrame进行操作，
-    if worksheet == "undergraduate_workload_course_ranking":
-        for json_data in json_data_list:
-            UndergraduateWorkloadCourseRanking.add_UndergraduateWorkloadCourseRanking(json_data)
-    elif worksheet == "undergraduate_thesis":
-        for json_data in json_data_list:
-            UndergraduateThesi.add_thesis_record(json_data)
-    elif worksheet == "department_internship":
-        for json_data in json_data_list:
-            DepartmentInternship.add_internship_record(json_data)
-    elif worksheet == "competition_awards":
-        for json_data in json_data_list:
-            # columns = ["序号", "赛事名称", "作品名称", "获奖类别", "获奖等级", "指导教师", "指导教师工号", "总工作量","获奖年份"]
-            CompetitionAward.add_competition_award(json_data)
-    elif worksheet == "student_research":
-        for json_data in json_data_list:
-            # columns = ["序号", "项目名称", "级别", "负责人", "学号", "项目组总人数", "指导老师", "指导老师工号", "验收结果","工作量"]
-            StudentResearch.add_student_research_record(json_data)
-    elif worksheet == "undergraduate_mentorship_system":
-        for json_data in json_data_list:
-            # columns = ["导师姓名", "教工号", "学生姓名", "年级", "学号", "教师工作量"]
-            UndergraduateMentorshipSystem.add_mentorship_record(json_data)
-    elif worksheet == "educational_research_project":
-        for json_data in json_data_list:
-            # columns = ["序号", "项目名称", "项目负责人", "项目成员", "级别", "立项时间", "结项时间", "验收结论",
-            #                    "教师姓名", "工号", "教研项目工作量"]
-            EducationalResearchProject.add_research_project(json_data)
-    elif worksheet == "first_class_courses":
-        for json_data in json_data_list:
-            # columns = ["序号", "课程性质", "内容", "负责人", "备注", "教师姓名", "工号", "一流课程工作量"]
-            FirstClassCourse.add_first_class_course(json_data)
-    elif worksheet == "teaching_achievement_awards":
-        for json_data in json_data_list:
-            # columns = ["序号", "届", "时间", "推荐成果名称", "成果主要完成人名称", "获奖类别", "获奖等级", "备注", "教师",
-            #   "工号", "教学成果工作量"]
-            TeachingAchievementAward.add_teaching_achievement_record(json_data)
-    elif worksheet == "public_services":
-        for json_data in json_data_list:
-            # columns = ["序号", "日期", "内容", "姓名", "工作时长", "课时", "教师工号"]
-            PublicService.add_public_service_record(json_data)
+# 选择整个工作簿导入时 selectedWorksheet 的取值
+WORKBOOK = "workbook"
+
+# 整个工作簿导入时的写库顺序。十张表之间没有外键依赖（都只依赖教师信息表），
+# 按固定顺序写入，全部写完后一起提交
+WORKSHEET_IMPORT_ORDER = list(WORKSHEETS)
+
+
+# 读取上传的csv/xlsx文件为DataFrame，xlsx 使用配置 XLSX_READER 指定的读取引擎；
+# file_name 也可以是上传的文件流，这时由 extension 指明文件类型
+def read_worksheet(file_name, extension=None):
+    return read_table(file_name, extension=extension)
+
+
+# 把DataFrame按列整体转换成json_data_list，不再逐行iterrows
+def frame_to_records(df, worksheet):
+    columns = WORKSHEETS[worksheet].columns
+    # 表头两侧的空格会导致取列失败，这里统一去掉
+    df = df.rename(columns=lambda column: column.strip() if isinstance(column, str) else column)
+    missing = [column for column in columns if column not in df.columns]
+    if missing:
+        raise KeyError("导入文件缺少列: %s" % "、".join(missing))
+    # 只保留需要的列并按列顺序排好，to_dict('records')在底层按列批量取值，比逐行构造字典快得多
+    return df[columns].to_dict('records')
+
+
+# 是否在写库前校验导入文件，未指定时按配置 IMPORT_VALIDATE
+def _validating(validate):
+    if validate is None:
+        return current_app.config.get('IMPORT_VALIDATE', True) if has_app_context() else False
+    return validate
+
+
+# 处理导入文件，返回每行一个字典的json_data_list；校验不通过时抛出 ValidationError
+def analyse_worksheet(file_name, worksheet, validate=None, extension=None):
+    if worksheet not in WORKSHEETS:
+        raise ValueError("未知的表: %s" % worksheet)
+    df = read_worksheet(file_name, extension)
+    if _validating(validate):
+        df, errors = validate_frame(df, worksheet)
+        if errors:
+            raise ValidationError(errors)
+    return frame_to_records(df, worksheet)
+
+
+# 分块读取导入文件，每次产出chunk_size行的json_data_list，csv和xlsx文件都不会整个读进内存
+def iter_worksheet_chunks(file_name, worksheet, chunk_size, validate=None, extension=None):
+    if worksheet not in WORKSHEETS:
+        raise ValueError("未知的表: %s" % worksheet)
+    validate = _validating(validate)
+    teacher_ids = known_teacher_ids() if validate else None
+    seen_keys = set()
+    errors = []
+    for df in iter_table_chunks(file_name, chunk_size, extension=extension):
+        if validate:
+            df, chunk_errors = validate_frame(df, worksheet, teacher_ids, seen_keys)
+            errors.extend(chunk_errors)
+            # 出现错误后不再产出数据，只把剩下的块校验完，最后一次报告全部错误；
+            # 之前已写入的块和整个导入在同一个事务里，会一起回滚
+            if errors:
+                continue
+        yield frame_to_records(df, worksheet)
+    if errors:
+        raise ValidationError(errors)
+
+
+# 把工作簿里的工作表对应到要导入的表，返回 ({表: 工作表名}, 未导入的工作表名)
+def match_sheets(sheet_names):
+    sheets = {}
+    skipped = []
+    for sheet_name in sheet_names:
+        # 工作表名称可以是中文表名，也可以直接是英文表名
+        sheet = get_worksheet(sheet_name)
+        if sheet is None or sheet.key in sheets:
+            skipped.append(sheet_name)
+        else:
+            sheets[sheet.key] = sheet_name
+    return sheets, skipped
+
+
+def analyse_workbook(file_name, validate=None):
+    """只打开一次工作簿，并发解析其中能对应上的各个工作表，返回 ({表: json_data_list}, 未导入的工作表名)"""
+    validate = _validating(validate)
+    # 线程里没有应用上下文，教工号集合先在这里取好
+    teacher_ids = known_teacher_ids() if validate else None
+
+    def parse(workbook, worksheet, sheet_name):
+        df = workbook.read(sheet_name)
+        if not validate:
+            return df, []
+        return validate_frame(df, worksheet, teacher_ids)
+
+    with XlsxReader(file_name) as workbook:
+        sheets, skipped = match_sheets(workbook.sheet_names)
+        if not sheets:
+            return {}, skipped
+        with ThreadPoolExecutor(max_workers=len(sheets)) as executor:
+            futures = {worksheet: executor.submit(parse, workbook, worksheet, sheet_name)
+                       for worksheet, sheet_name in sheets.items()}
+            parsed = {}
+            errors = []
+            for worksheet, future in futures.items():
+                try:
+                    df, sheet_errors = future.result()
+                except ValidationError as e:
+                    sheet_errors = e.errors
+                errors.extend(sheet_errors)
+                if not errors:
+                    parsed[worksheet] = frame_to_records(df, worksheet)
+    if errors:
+        raise ValidationError(errors)
+    return parsed, skipped
+
+
+def import_workbook(file_name, mode='insert', batch_size=None, progress=None):
+    """
+    一次上传导入整个工作簿：各工作表并发解析后按 WORKSHEET_IMPORT_ORDER 依次写库，
+    全部在一个事务里提交，任何一张表失败则整个工作簿回滚；返回 ({表: 各类行数}, 未导入的工作表名)。
+    能对应上的工作表不止一张且 IMPORT_PARSE_WORKERS 允许多个进程时，改为在进程池里分块解析，
+    解析好的块按到达顺序由当前进程写库
+    """
+    with XlsxReader(file_name) as workbook:
+        sheets, skipped = match_sheets(workbook.sheet_names)
+    workers = parse_workers(current_app.config.get('IMPORT_PARSE_WORKERS'), len(sheets))
+    if workers > 1:
+        if hasattr(file_name, 'read'):
+            # 文件流不能传给子进程，传文件内容
+            file_name.seek(0)
+            file_name = file_name.read()
+        validate = _validating(None)
+        results = import_workbook_parallel(
+            file_name, sheets, workers, mode, batch_size, progress,
+            chunk_size=current_app.config.get('IMPORT_CHUNK_SIZE', 10000), engine=xlsx_engine(),
+            validate=validate, teacher_ids=known_teacher_ids() if validate else None)
+        return results, skipped
+    if hasattr(file_name, 'seek'):
+        file_name.seek(0)
+    parsed, skipped = analyse_workbook(file_name)
+    results = {}
+    done = 0
+
+    def sheet_progress(number, chunk_rows, total_rows):
+        nonlocal done
+        done += chunk_rows
+        if progress is not None:
+            progress(number, chunk_rows, done)
+
+    # 外层统一暂停排名表维护并提交，各表导入时沿用这一个事务
+    with deferred_rankings():
+        for worksheet in WORKSHEET_IMPORT_ORDER:
+            if worksheet in parsed:
+                results[worksheet] = import_chunks(worksheet, [parsed.pop(worksheet)], mode, batch_size,
+                                                   progress=sheet_progress)
+    return results, skipped
+
+
+# 处理好数据后直接导入，bulk为True时整张表批量插入并在一个事务内提交
+def process_work(worksheet, json_data_list, bulk=False, batch_size=None):
+    if bulk:
+        bulk_import(worksheet, json_data_list, batch_size)
+        return
+    # 逐行导入，每行单独 flush，全部导入后统一重算排名表并一次提交；任何一行失败则整个上传回滚
+    with deferred_rankings():
+        _process_rows(worksheet, json_data_list)
+
+
+def _process_rows(worksheet, json_data_list):
+    sheet = WORKSHEETS[worksheet]
+    for json_data in json_data_list:
+        sheet.add(json_data, commit=False)
 
 
 # 用蓝图注册路由
@@ -277,75 +240,147 @@ def upload_file():
             flash({'error': '文件扩展名有问题'})
             return redirect(request.url)
 
-        # 在这里处理文件
-        file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], file.filename))
         # 获取选定的表单名
         worksheet = request.form.get('selectedWorksheet')
+        if worksheet not in WORKSHEETS and worksheet != WORKBOOK:
+            flash({'error': '请先选择要导入的表'})
+            return redirect(request.url)
+        # 导入方式：insert 只插入新行；upsert 按主键插入或更新，适合重新上传修正后的表格
+        mode = request.form.get('importMode') or current_app.config.get('IMPORT_MODE', 'insert')
+        if mode not in IMPORT_MODES:
+            flash({'error': '未知的导入方式'})
+            return redirect(request.url)
+        if worksheet == WORKBOOK and not file.filename.lower().endswith('.xlsx'):
+            flash({'error': '整个工作簿导入只支持xlsx文件'})
+            return redirect(request.url)
+
+        # 直接从上传的文件流解析，不先写入 UPLOAD_FOLDER 再读回来
+        extension = os.path.splitext(file.filename)[1].lower()
+        if mode == 'diff':
+            return preview_upload(file.stream, worksheet, extension)
+        asynchronous = current_app.config.get('IMPORT_ASYNC', False)
+        # 后台导入：请求结束后文件流会被关闭，把内容读出来交给任务
+        source = file.read() if asynchronous else file.stream
+
+        if asynchronous:
+            size = len(source)
+        else:
+            size = source.seek(0, os.SEEK_END)
+            source.seek(0)
+        # 同样内容的文件已经导入过（或正在导入）这张表时，直接跳过解析和写库；检查和登记一次完成
+        store = get_store(current_app.config['UPLOAD_FOLDER'])
+        digest = content_digest(source)
+        _, duplicate = store.claim(digest, file.filename, worksheet, mode, getattr(current_user, 'teacher_id', None),
+                                   size, force=bool(request.form.get('force')),
+                                   stale_after=current_app.config.get('UPLOAD_IMPORT_TIMEOUT'))
+        if duplicate is not None:
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify({'duplicate': True, 'upload': duplicate})
+            flash({'success': '相同内容的文件已经导入过，本次未重复导入', 'sha256': digest,
+                   '状态': duplicate['status'], '行数': duplicate['rows']})
+            return redirect(url_for('upload_page.upload_file'))
+        if current_app.config.get('UPLOAD_ARCHIVE', False):
+            store.store(digest, extension, source if asynchronous else source.read())
+            if not asynchronous:
+                source.seek(0)
+
+        if asynchronous:
+            def finish(state):
+                status = 'imported' if state['status'] == 'done' else 'failed'
+                store.finish(digest, worksheet, status, count_rows(state['counts']))
 
-        # 解析上传的文件变成json_data_list
-        json_data_list = analyse_worksheet(file.filename, worksheet)
-        # 处理文件
-        process_work(worksheet, json_data_list)
-        flash({'success': '文件上传成功'})
+            job_id = submit_import_job(current_app._get_current_object(), source, worksheet, mode, extension,
+                                       on_finish=finish)
+            status_url = url_for('upload_page.import_job_status', job_id=job_id)
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify({'job_id': job_id, 'status_url': status_url, 'sha256': digest}), 202
+            flash({'success': '文件已提交后台导入', 'job_id': job_id, 'status_url': status_url})
+            return redirect(url_for('upload_page.upload_file'))
+
+        # 在这里处理文件：werkzeug 把上传文件放在内存或临时文件中，直接从中解析
+        def log_progress(number, chunk_rows, total_rows):
+            current_app.logger.info("%s 第%d块导入%d行，累计%d行", worksheet, number, chunk_rows, total_rows)
+
+        try:
+            if worksheet == WORKBOOK:
+                results, skipped = import_workbook(source, mode, current_app.config.get('IMPORT_BATCH_SIZE'),
+                                                   progress=log_progress)
+                rows = count_rows(results)
+                flash({'success': '工作簿导入成功', '各表行数': results, '未导入的工作表': skipped})
+            elif current_app.config.get('IMPORT_BULK', False) or mode == 'upsert':
+                # 分块读取并逐块写库，内存占用不随文件大小增长
+                chunk_size = current_app.config.get('IMPORT_CHUNK_SIZE', 10000)
+                chunks = iter_worksheet_chunks(source, worksheet, chunk_size, extension=extension)
+                counts = import_chunks(worksheet, chunks, mode, current_app.config.get('IMPORT_BATCH_SIZE'),
+                                       progress=log_progress)
+                rows = count_rows(counts)
+                flash({'success': '文件上传成功', '新增': counts['inserted'], '更新': counts['updated'],
+                       '未变': counts['unchanged']})
+            else:
+                # 解析上传的文件变成json_data_list
+                json_data_list = analyse_worksheet(source, worksheet, extension=extension)
+                # 处理文件
+                process_work(worksheet, json_data_list)
+                rows = len(json_data_list)
+                flash({'success': '文件上传成功'})
+        except ValidationError as e:
+            store.finish(digest, worksheet, 'failed')
+            # 校验不通过时什么都不写入，返回逐行的错误报告
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify({'error': str(e), 'errors': e.errors}), 422
+            flash({'error': str(e), '错误': e.errors[:FLASH_ERRORS]})
+        except Exception:
+            store.finish(digest, worksheet, 'failed')
+            raise
+        else:
+            store.finish(digest, worksheet, 'imported', rows)
         return redirect(url_for('upload_page.upload_file'))
 
 
+# 试导入：报告上传文件会新增、更新（及变化的列）和不变的行，不写库，也不登记到上传文件仓库
+def preview_upload(source, worksheet, extension):
+    try:
+        if worksheet == WORKBOOK:
+            diff, skipped = import_workbook(source, 'diff')
+        else:
+            chunks = iter_worksheet_chunks(source, worksheet, current_app.config.get('IMPORT_CHUNK_SIZE', 10000),
+                                           extension=extension)
+            diff, skipped = import_chunks(worksheet, chunks, 'diff'), []
+    except ValidationError as e:
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify({'error': str(e), 'errors': e.errors}), 422
+        flash({'error': str(e), '错误': e.errors[:FLASH_ERRORS]})
+        return redirect(url_for('upload_page.upload_file'))
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'dry_run': True, 'diff': diff, 'skipped_sheets': skipped})
+    # 整个工作簿时 diff 按表分别统计
+    sheets = diff.values() if worksheet == WORKBOOK else [diff]
+    flash({'success': '试导入完成，未写入任何数据',
+           '新增': sum(sheet['inserted'] for sheet in sheets),
+           '更新': sum(sheet['updated'] for sheet in sheets),
+           '未变': sum(sheet['unchanged'] for sheet in sheets),
+           '变化明细': [change for sheet in sheets for change in sheet['changes']][:FLASH_ERRORS]})
+    return redirect(url_for('upload_page.upload_file'))
+
+
+# 查询后台导入任务的进度：已处理行数、吞吐量、错误信息和最终导入行数
+@upload_page_blueprint.route("/file_upload/jobs/<job_id>")
+@login_required
+def import_job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    return jsonify(job)
+
+
 # 展示要提交的内容表单
 @upload_page_blueprint.route("/file_upload/add", methods=['POST', 'GET'])
 @login_required
 def upload_file_add():
-    worksheet = request.form.get('worksheet')
-    if worksheet == "NULL":
+    sheet = WORKSHEETS.get(request.form.get('worksheet'))
+    if sheet is None:
         return render_template('file_upload.html')
-    elif worksheet == "undergraduate_workload_course_ranking":
-        table_name = "本科工作量课程排序表"
-        columns = ["学年", "学期", "自然年", "上下半年", "课程号", "教学班", "课程名称", "教工号", "教师名称",
-                   "研讨学时", "授课学时", "实验学时", "选课人数", "学生数量权重系数B", "课程类型系数A",
-                   "理论课总学时P1", "实验分组数", "实验课系数", "实验课总学时P2", "课程拆分占比（工程中心用）",
-                   "课程总学时"]
-        return render_template('file_upload.html', table_name=table_name, columns=columns)
-    elif worksheet == "undergraduate_thesis":
-        table_name = "毕业论文"
-        columns = ["学生姓名", "学生学号", "学院", "专业", "专业号", "年级", "毕业论文题目", "毕业论文成绩",
-                   "毕业论文指导老师", "毕业论文指导老师工号"]
-        return render_template('file_upload.html', table_name=table_name, columns=columns)
-    elif worksheet == "department_internship":
-        table_name = "本科实习"
-        columns = ["学生姓名", "学生学号", "专业", "年级", "学部内实习指导教师", "学部内实习指导教师工号", "实习周数"]
-        return render_template('file_upload.html', table_name=table_name, columns=columns)
-    elif worksheet == "competition_awards":
-        table_name = "学生竞赛"
-        columns = ["序号", "赛事名称", "作品名称", "获奖类别", "获奖等级", "指导教师", "指导教师工号", "总工作量",
-                   "获奖年份"]
-        return render_template('file_upload.html', table_name=table_name, columns=columns)
-    elif worksheet == "student_research":
-        table_name = "学生科研"
-        columns = ["序号", "项目名称", "级别", "负责人", "学号", "项目组总人数", "指导老师", "指导老师工号", "验收结果",
-                   "工作量"]
-        return render_template('file_upload.html', table_name=table_name, columns=columns)
-    elif worksheet == "undergraduate_mentorship_system":
-        table_name = "本科生导师制"
-        columns = ["导师姓名", "教工号", "学生姓名", "年级", "学号", "教师工作量"]
-        return render_template('file_upload.html', table_name=table_name, columns=columns)
-    elif worksheet == "educational_research_project":
-        table_name = "教研项目"
-        columns = ["序号", "项目名称", "项目负责人", "项目成员", "级别", "立项时间", "结项时间", "验收结论",
-                   "教师姓名", "工号", "教研项目工作量"]
-        return render_template('file_upload.html', table_name=table_name, columns=columns)
-    elif worksheet == "first_class_courses":
-        table_name = "一流课程"
-        columns = ["序号", "课程性质", "内容", "负责人", "备注", "教师姓名", "工号", "一流课程工作量"]
-        return render_template('file_upload.html', table_name=table_name, columns=columns)
-    elif worksheet == "teaching_achievement_awards":
-        table_name = "教学成果奖"
-        columns = ["序号", "届", "时间", "推荐成果名称", "成果主要完成人名称", "获奖类别", "获奖等级", "备注", "教师",
-                   "工号", "教学成果工作量"]
-        return render_template('file_upload.html', table_name=table_name, columns=columns)
-    elif worksheet == "public_services":
-        table_name = "公共服务"
-        columns = ["序号", "日期", "内容", "姓名", "工作时长", "课时", "教师工号", "工作量"]
-        return render_template('file_upload.html', table_name=table_name, columns=columns)
-    return render_template('file_upload.html')
+    return render_template('file_upload.html', table_name=sheet.table_name, columns=sheet.columns)
 
 
 # 提交的按钮的路由
@@ -356,46 +391,10 @@ def upload_file_submit():
         # 获取前端发送的 JSON 数据
         json_data = request.get_json()
         if json_data:
-            table_name = json_data["表名"]
-            if table_name == "本科工作量课程排序表":
-                UndergraduateWorkloadCourseRanking.add_UndergraduateWorkloadCourseRanking(json_data)
-                return render_template('file_upload.html')
-            elif table_name == "毕业论文":
-                UndergraduateThesi.add_thesis_record(json_data)
-                return render_template('file_upload.html')
-            elif table_name == "本科实习":
-                DepartmentInternship.add_internship_record(json_data)
-                return render_template('file_upload.html')
-            elif table_name == "学生竞赛":
-                # columns = ["序号", "赛事名称", "作品名称", "获奖类别", "获奖等级", "指导教师", "指导教师工号", "总工作量","获奖年份"]
-                CompetitionAward.add_competition_award(json_data)
-                return render_template('file_upload.html')
-            elif table_name == "学生科研":
-                # columns = ["序号", "项目名称", "级别", "负责人", "学号", "项目组总人数", "指导老师", "指导老师工号", "验收结果","工作量"]
-                StudentResearch.add_student_research_record(json_data)
-                return render_template('file_upload.html')
-            elif table_name == "本科生导师制":
-                # columns = ["导师姓名", "教工号", "学生姓名", "年级", "学号", "教师工作量"]
-                UndergraduateMentorshipSystem.add_mentorship_record(json_data)
-                return render_template('file_upload.html')
-            elif table_name == "教研项目":
-                # columns = ["序号", "项目名称", "项目负责人", "项目成员", "级别", "立项时间", "结项时间", "验收结论",
-                #                    "教师姓名", "工号", "教研项目工作量"]
-                EducationalResearchProject.add_research_project(json_data)
-                return render_template('file_upload.html')
-            elif table_name == "一流课程":
-                # columns = ["序号", "课程性质", "内容", "负责人", "备注", "教师姓名", "工号", "一流课程工作量"]
-                FirstClassCourse.add_first_class_course(json_data)
-                return render_template('file_upload.html')
-            elif table_name == "教学成果奖":
-                # columns = ["序号", "届", "时间", "推荐成果名称", "成果主要完成人名称", "获奖类别", "获奖等级", "备注", "教师",
-                #   "工号", "教学成果工作量"]
-                TeachingAchievementAward.add_teaching_achievement_record(json_data)
-                return render_template('file_upload.html')
-            elif table_name == "公共服务":
-                # columns = ["序号", "日期", "内容", "姓名", "工作时长", "课时", "教师工号"]
-                PublicService.add_public_service_record(json_data)
-                return render_template('file_upload.html')
+            sheet = WORKSHEETS_BY_TABLE_NAME.get(json_data["表名"])
+            if sheet is not None:
+                sheet.add(json_data)
+            return render_template('file_upload.html')
         else:
             print("NO DATA")
     else:
@@ -0,0 +1,200 @@
+# 上传文件仓库：按内容的 sha256 识别上传文件，索引文件 index.json 记录每份内容导入到了哪张表、
+# 上传人、行数和导入状态；内容完全相同的文件再次上传时直接跳过解析和写库。
+# 需要保留原件时在后台线程里以 <sha256><后缀名> 保存，同样的内容只存一份。
+# 多个 web 进程共用一个目录，索引的读写用文件锁互斥
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# 归档只做顺序的文件写入，一个线程就够了
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='upload-archive')
+
+# 计算哈希时每次读取的字节数
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def content_digest(source):
+    """计算上传内容的 sha256，source 为 bytes 或文件流（读完后回到开头）"""
+    if isinstance(source, bytes):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    for block in iter(lambda: source.read(HASH_BLOCK_SIZE), b''):
+        digest.update(block)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+def _write_file(path, data):
+    # 先写临时文件再改名，其他进程不会读到写了一半的文件
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    return path
+
+
+# 登记导入的进程是否还在运行，不是本机登记的无法判断，按仍在运行处理
+def _alive(record):
+    if record.get('host') != socket.gethostname() or not record.get('pid'):
+        return True
+    try:
+        os.kill(record['pid'], 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class UploadStore(object):
+    """folder 下的上传文件仓库，索引的读写在进程内加线程锁、进程间加文件锁，写入时整体替换索引文件"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.index_path = os.path.join(folder, 'index.json')
+        self.lock_path = os.path.join(folder, 'index.lock')
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _lock(self):
+        with self._thread_lock, open(self.lock_path, 'a+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _load(self):
+        """索引为 {sha256: {表: 记录}}，同样的内容导入不同的表各有一条记录"""
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path, encoding='utf-8') as f:
+            index = json.load(f)
+        # 旧索引每份内容只有一条记录
+        return {digest: {records['worksheet']: records} if 'sha256' in records else records
+                for digest, records in index.items()}
+
+    def _save(self, index):
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.index_path)
+
+    def get(self, digest, worksheet):
+        with self._lock():
+            return self._load().get(digest, {}).get(worksheet)
+
+    @staticmethod
+    def _duplicate(record, stale_after):
+        """
+        record 为同样内容导入同一张表的记录，已经导入或正在导入时返回 True；
+        导入中的进程已退出或超过 stale_after 秒时可以重新导入
+        """
+        if record is None:
+            return False
+        if record['status'] == 'imported':
+            return True
+        if record['status'] != 'importing':
+            return False
+        if stale_after is not None and time.time() - record['uploaded_at'] > stale_after:
+            return False
+        return _alive(record)
+
+    def claim(self, digest, file_name, worksheet, mode, uploader, size, force=False, stale_after=None):
+        """
+        检查重复并登记一次导入，两步在同一把锁内完成，同时上传同样内容的两个请求只有一个能登记。
+        返回 (本次的记录, None)；已经导入或正在导入同一张表时不登记，返回 (None, 那次的记录)。
+        force 为 True 时不检查重复
+        """
+        record = {
+            'sha256': digest,
+            'file_name': file_name,
+            'size': size,
+            'worksheet': worksheet,
+            'mode': mode,
+            'uploader': uploader,
+            'rows': None,
+            'status': 'importing',
+            'uploaded_at': time.time(),
+            'finished_at': None,
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+        }
+        with self._lock():
+            index = self._load()
+            records = index.setdefault(digest, {})
+            existing = records.get(worksheet)
+            if not force and self._duplicate(existing, stale_after):
+                return None, existing
+            # 之前保存过原件的，继续沿用
+            record['stored_as'] = next((other['stored_as'] for other in records.values() if other.get('stored_as')),
+                                       None)
+            records[worksheet] = record
+            self._save(index)
+        return record, None
+
+    def finish(self, digest, worksheet, status, rows=None):
+        """导入结束后记录这份内容导入这张表的状态 imported/failed 和导入的行数"""
+        with self._lock():
+            index = self._load()
+            record = index.get(digest, {}).get(worksheet)
+            if record is not None:
+                record.update(status=status, rows=rows, finished_at=time.time())
+                self._save(index)
+        return record
+
+    def store(self, digest, extension, data):
+        """在后台线程里把原件保存为 <sha256><后缀名>，已经存在时不重复写入，返回 Future 或 None"""
+        file_name = digest + extension
+        path = os.path.join(self.folder, file_name)
+        with self._lock():
+            index = self._load()
+            if digest in index:
+                for record in index[digest].values():
+                    record['stored_as'] = file_name
+                self._save(index)
+        if os.path.exists(path):
+            return None
+        return _executor.submit(_write_file, path, data)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(folder):
+    """每个目录共用一个仓库对象，索引的锁才能起作用"""
+    folder = os.path.abspath(folder)
+    with _stores_lock:
+        if folder not in _stores:
+            os.makedirs(folder, exist_ok=True)
+            _stores[folder] = UploadStore(folder)
+        return _stores[folder]
+
+
+# 导入结果中的总行数，整个工作簿导入时把各表加起来
+def count_rows(counts):
+    if counts is None:
+        return None
+    if 'inserted' in counts:
+        return counts['inserted'] + counts['updated'] + counts['unchanged']
+    return sum(count_rows(sheet_counts) for sheet_counts in counts.values())
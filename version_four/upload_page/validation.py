@@ -0,0 +1,131 @@
+# 导入前校验：写库之前按列整体检查整张表，转换字段类型、检查主键重复和教师工号是否存在，
+# 返回逐行的错误报告，有错误时整个文件都不写库
+import pandas as pd
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+
+from version_four.database import db
+from version_four.models import TeacherInformation
+from version_four.worksheets import WORKSHEETS
+
+
+class ValidationError(ValueError):
+    """导入文件没有通过校验，errors 为逐行的错误报告"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super(ValidationError, self).__init__("导入文件有%d处错误，未导入任何数据" % len(errors))
+
+
+def known_teacher_ids():
+    """教师信息表中全部的教工号，每个应用只查一次，教师信息有增删时失效"""
+    teacher_ids = current_app.extensions.get('teacher_ids')
+    if teacher_ids is None:
+        teacher_ids = frozenset(db.session.execute(select(TeacherInformation.teacher_id)).scalars())
+        current_app.extensions['teacher_ids'] = teacher_ids
+    return teacher_ids
+
+
+@event.listens_for(TeacherInformation, 'after_insert')
+@event.listens_for(TeacherInformation, 'after_delete')
+@event.listens_for(TeacherInformation, 'after_update')
+def discard_teacher_ids(mapper, connection, target):
+    if has_app_context():
+        current_app.extensions.pop('teacher_ids', None)
+
+
+# 表格中的行号：表头是第1行，数据从第2行开始
+def _row_number(index):
+    return int(index) + 2
+
+
+def _report(errors, worksheet, column, series, message):
+    for index, value in series.items():
+        errors.append({'row': _row_number(index), 'column': column, 'value': None if pd.isna(value) else str(value),
+                       'error': message, 'worksheet': worksheet})
+
+
+# 去掉字符串两端的空格，空字符串当作空单元格
+def _strip(series):
+    if not (series.dtype == object or pd.api.types.is_string_dtype(series)):
+        return series
+    stripped = series.str.strip()
+    series = stripped.where(stripped.notna(), series)
+    return series.astype(object).mask(series == '')
+
+
+# 编号类的列从表格里读出来可能是 2021001.0，统一转成 '2021001'
+def _as_string(series):
+    present = series.notna()
+    result = series.astype(object).where(present, None)
+    if pd.api.types.is_numeric_dtype(series):
+        numbers = series[present]
+        whole = numbers % 1 == 0
+        text = numbers.astype(str)
+        text[whole] = numbers[whole].astype('int64').astype(str)
+        result[present] = text
+    else:
+        others = present & ~series.map(type).eq(str)
+        result[others] = series[others].map(
+            lambda value: str(int(value)) if isinstance(value, float) and value.is_integer() else str(value))
+    return result
+
+
+def validate_frame(df, worksheet, teacher_ids=None, seen_keys=None):
+    """
+    校验并转换一张表（或一块），返回 (转换后的DataFrame, 错误列表)。
+    每个错误为 {'row': 行号, 'column': 列名, 'value': 原值, 'error': 说明, 'worksheet': 表名}；
+    分块校验时传入同一个 seen_keys 集合，检查跨块的主键重复。缺少列时直接抛出 ValidationError
+    """
+    sheet = WORKSHEETS[worksheet]
+    df = df.rename(columns=lambda column: column.strip() if isinstance(column, str) else column)
+    missing = [column for column in sheet.columns if column not in df.columns]
+    if missing:
+        raise ValidationError([{'row': None, 'column': column, 'value': None, 'error': '缺少列',
+                                'worksheet': worksheet} for column in missing])
+    df = df[sheet.columns].copy()
+    errors = []
+
+    for column, kind in sheet.dtypes.items():
+        original = _strip(df[column])
+        present = original.notna()
+        if kind == 'string':
+            df[column] = _as_string(original)
+            continue
+        if kind == 'date':
+            converted = pd.to_datetime(original, errors='coerce', format='mixed')
+            bad = present & converted.isna()
+            _report(errors, worksheet, column, original[bad], '不是日期')
+            df[column] = converted.dt.date.astype(object).where(converted.notna(), None)
+            continue
+        converted = pd.to_numeric(original, errors='coerce')
+        bad = present & converted.isna()
+        _report(errors, worksheet, column, original[bad], '不是数字')
+        if kind == 'integer':
+            fraction = present & converted.notna() & (converted % 1 != 0)
+            _report(errors, worksheet, column, original[fraction], '不是整数')
+            converted = converted.mask(fraction).round().astype('Int64')
+        df[column] = converted
+
+    for column in sheet.required:
+        _report(errors, worksheet, column, df[column][df[column].isna()], '不能为空')
+
+    # 文件内主键重复的行（第一次出现的行不算）
+    keys = df[sheet.key_columns]
+    complete = keys.notna().all(axis=1)
+    duplicated = complete & keys.duplicated(keep='first')
+    if seen_keys is not None:
+        key_tuples = pd.Series(list(zip(*(keys[column] for column in sheet.key_columns))), index=keys.index)
+        duplicated |= complete & key_tuples.map(seen_keys.__contains__)
+        seen_keys.update(key_tuples[complete])
+    for column in sheet.key_columns:
+        _report(errors, worksheet, column, df[column][duplicated], '主键重复')
+
+    if teacher_ids is None:
+        teacher_ids = known_teacher_ids()
+    teacher = df[sheet.teacher_column]
+    unknown = teacher.notna() & ~teacher.isin(teacher_ids)
+    _report(errors, worksheet, sheet.teacher_column, teacher[unknown], '教工号不存在')
+
+    errors.sort(key=lambda error: (error['row'], sheet.columns.index(error['column'])))
+    return df, errors
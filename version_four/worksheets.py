@@ -0,0 +1,262 @@
+# 十张工作量表的登记表：英文表名、中文表名、模型、导入文件列名到数据库字段的映射。
+# 上传、新增、修改、查询等页面都按表名在这里查到对应的表，不再各自写一长串 if/elif
+from sqlalchemy import select
+from sqlalchemy.sql import sqltypes
+
+from version_four.database import db
+from version_four.models import CompetitionAward, DepartmentInternship, \
+    EducationalResearchProject, FirstClassCourse, PublicService, StudentResearch, TeachingAchievementAward, \
+    UndergraduateMentorshipSystem, UndergraduateThesi, UndergraduateWorkloadCourseRanking
+from version_four.pagination import keyset_page
+from version_four.serializers import row_getter, serialize_rows
+
+
+# 按数据库字段类型确定导入时的校验类型：'string' 'integer' 'number' 'date'
+def column_kind(column_type):
+    if isinstance(column_type, sqltypes.Integer):
+        return 'integer'
+    if isinstance(column_type, sqltypes.Numeric):
+        return 'number'
+    if isinstance(column_type, (sqltypes.Date, sqltypes.DateTime)):
+        return 'date'
+    return 'string'
+
+
+class Worksheet(object):
+    """
+    一张工作量表。fields 为 {中文列名: 数据库字段}，顺序即导入文件、页面表头和查询结果的列顺序；
+    dtypes 可以覆盖按字段类型推断的校验类型（如以字符串保存的数字列）；
+    create_missing 为 True 时修改不存在的记录会新增一条（只有课程排序表这样处理）。
+    列顺序、主键、校验类型和取值函数在启动时一次算好
+    """
+
+    def __init__(self, key, table_name, model, fields, dtypes=None, create_missing=False):
+        self.key = key
+        self.table_name = table_name
+        self.model = model
+        self.fields = fields
+        self.create_missing = create_missing
+        self.columns = list(fields)
+        self.attrs = list(fields.values())
+        table = model.__table__
+        # 主键字段，以及它们在导入文件中的列名
+        self.key_attrs = [column.name for column in table.primary_key.columns]
+        self.key_columns = [column for column, attr in fields.items() if attr in self.key_attrs]
+        # 每一列导入时的校验类型
+        self.dtypes = {column: column_kind(table.c[attr].type) for column, attr in fields.items()}
+        self.dtypes.update(dtypes or {})
+        # 导入时不能为空的列：主键（自增主键除外）和教师工号
+        autoincrement = table.autoincrement_column
+        self.teacher_column = next(column for column, attr in fields.items() if attr == 'teacher_id')
+        self.required = [column for column in self.key_columns
+                         if autoincrement is None or fields[column] != autoincrement.name]
+        if self.teacher_column not in self.required:
+            self.required.append(self.teacher_column)
+        self.string_fields = [attr for attr in self.attrs if isinstance(table.c[attr].type, sqltypes.String)]
+        self._values = row_getter(self.attrs)
+
+    def to_row(self, json_data):
+        """把一条 json_data 转换成以数据库字段为键的字典"""
+        return {attr: json_data[column] for column, attr in self.fields.items()}
+
+    def add(self, json_data, commit=True):
+        """新增一条记录，commit 为 False 时只 flush，由调用方统一提交"""
+        db.session.add(self.model(**self.to_row(json_data)))
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
+
+    def update(self, json_data):
+        """按主键修改一条记录，返回是否找到了这条记录；create_missing 为 True 时找不到则新增"""
+        row = self.to_row(json_data)
+        record = db.session.get(self.model, tuple(row[attr] for attr in self.key_attrs))
+        if record is None:
+            if not self.create_missing:
+                return False
+            record = self.model()
+            db.session.add(record)
+        for attr, value in row.items():
+            setattr(record, attr, value)
+        db.session.commit()
+        return True
+
+    def page(self, filters, after=None, before=None, limit=50):
+        """
+        按主键键集分页查询，filters 为 {数据库字段: 值}，值为空的条件不加。
+        返回 (本页记录, 上一页游标, 下一页游标)
+        """
+        return keyset_page(self.filtered(filters), self.key_attrs, after, before, limit)
+
+    def filtered(self, filters):
+        """只选出显示的各列、按 filters（{数据库字段: 值}，值为空的条件不加）筛选的查询"""
+        return self.select_columns().filter_by(**{attr: value for attr, value in filters.items() if value})
+
+    def iter_rows(self, filters, chunk_size=1000):
+        """
+        按主键顺序分块取出筛选到的全部行，每次产出不超过 chunk_size 行；
+        使用服务端游标（stream_results），整个结果不会一次读进内存
+        """
+        table = self.model.__table__
+        statement = self.filtered(filters).order_by(*[table.c[attr] for attr in self.key_attrs])
+        result = db.session.execute(statement.execution_options(yield_per=chunk_size))
+        try:
+            for rows in result.partitions():
+                yield rows
+        finally:
+            result.close()
+
+    def select_columns(self):
+        """
+        只查询页面上显示的各列，结果是按列顺序排列的轻量行元组，
+        不构造ORM对象，也不进入会话的 identity map
+        """
+        table = self.model.__table__
+        return select(*[table.c[attr] for attr in self.attrs])
+
+    def serialize(self, results):
+        """把整个查询结果（select_columns 的行元组或ORM对象）转换成按列顺序排列的二维列表，供页面渲染"""
+        return serialize_rows(results, self.attrs, self._values)
+
+
+WORKSHEETS = {}
+# 按中文表名查找
+WORKSHEETS_BY_TABLE_NAME = {}
+
+
+def register(key, table_name, model, fields, dtypes=None, create_missing=False):
+    worksheet = Worksheet(key, table_name, model, fields, dtypes, create_missing)
+    WORKSHEETS[key] = worksheet
+    WORKSHEETS_BY_TABLE_NAME[table_name] = worksheet
+    return worksheet
+
+
+def get_worksheet(name):
+    """按英文表名或中文表名查找，找不到时返回None"""
+    if name is None:
+        return None
+    name = str(name).strip()
+    return WORKSHEETS.get(name) or WORKSHEETS_BY_TABLE_NAME.get(name)
+
+
+register("undergraduate_workload_course_ranking", "本科工作量课程排序表", UndergraduateWorkloadCourseRanking, {
+    "学年": "academic_year",
+    "学期": "semester",
+    "自然年": "calendar_year",
+    "上下半年": "half_year",
+    "课程号": "course_code",
+    "教学班": "teaching_class",
+    "课程名称": "course_name",
+    "教工号": "teacher_id",
+    "教师名称": "teacher_name",
+    "研讨学时": "seminar_hours",
+    "授课学时": "lecture_hours",
+    "实验学时": "lab_hours",
+    "选课人数": "enrolled_students",
+    "学生数量权重系数B": "student_weight_coefficient_b",
+    "课程类型系数A": "course_type_coefficient_a",
+    "理论课总学时P1": "total_lecture_hours_p1",
+    "实验分组数": "lab_group_count",
+    "实验课系数": "lab_coefficient",
+    "实验课总学时P2": "total_lab_hours_p2",
+    "课程拆分占比（工程中心用）": "course_split_ratio_for_engineering_center",
+    "课程总学时": "total_course_hours",
+}, create_missing=True)
+register("undergraduate_thesis", "毕业论文", UndergraduateThesi, {
+    "学生姓名": "student_name",
+    "学生学号": "student_id",
+    "学院": "college",
+    "专业": "major",
+    "专业号": "major_id",
+    "年级": "grade",
+    "毕业论文题目": "thesis_topic",
+    "毕业论文成绩": "thesis_grade",
+    "毕业论文指导老师": "teacher_name",
+    "毕业论文指导老师工号": "teacher_id",
+})
+register("department_internship", "本科实习", DepartmentInternship, {
+    "学生姓名": "student_name",
+    "学生学号": "student_id",
+    "专业": "major",
+    "年级": "grade",
+    "学部内实习指导教师": "teacher_name",
+    "学部内实习指导教师工号": "teacher_id",
+    "实习周数": "week",
+}, dtypes={"实习周数": "integer"})
+register("competition_awards", "学生竞赛", CompetitionAward, {
+    "序号": "id",
+    "赛事名称": "event_name",
+    "作品名称": "work_name",
+    "获奖类别": "award_category",
+    "获奖等级": "award_level",
+    "指导教师": "teacher_name",
+    "指导教师工号": "teacher_id",
+    "总工作量": "total_workload",
+    "获奖年份": "award_year",
+})
+register("student_research", "学生科研", StudentResearch, {
+    "序号": "id",
+    "项目名称": "project_name",
+    "级别": "project_level",
+    "负责人": "leader",
+    "学号": "student_id",
+    "项目组总人数": "total_members",
+    "指导老师": "teacher_name",
+    "指导老师工号": "teacher_id",
+    "验收结果": "acceptance_result",
+    "工作量": "workload",
+})
+register("undergraduate_mentorship_system", "本科生导师制", UndergraduateMentorshipSystem, {
+    "导师姓名": "teacher_name",
+    "教工号": "teacher_id",
+    "学生姓名": "student_name",
+    "年级": "grade",
+    "学号": "student_id",
+    "教师工作量": "teacher_workload",
+})
+register("educational_research_project", "教研项目", EducationalResearchProject, {
+    "序号": "id",
+    "项目名称": "project_name",
+    "项目负责人": "project_leader",
+    "项目成员": "project_members",
+    "级别": "project_level",
+    "立项时间": "start_date",
+    "结项时间": "end_date",
+    "验收结论": "acceptance_result",
+    "教师姓名": "teacher_name",
+    "工号": "teacher_id",
+    "教研项目工作量": "research_project_workload",
+})
+register("first_class_courses", "一流课程", FirstClassCourse, {
+    "序号": "id",
+    "课程性质": "course_type",
+    "内容": "content",
+    "负责人": "leader",
+    "备注": "remark",
+    "教师姓名": "teacher_name",
+    "工号": "teacher_id",
+    "一流课程工作量": "first_class_course_workload",
+})
+register("teaching_achievement_awards", "教学成果奖", TeachingAchievementAward, {
+    "序号": "id",
+    "届": "student_session",
+    "时间": "student_date",
+    "推荐成果名称": "recommended_achievement_name",
+    "成果主要完成人名称": "main_completion_person_name",
+    "获奖类别": "award_category",
+    "获奖等级": "award_level",
+    "备注": "remark",
+    "教师": "teacher_name",
+    "工号": "teacher_id",
+    "教学成果工作量": "teaching_achievement_workload",
+})
+register("public_services", "公共服务", PublicService, {
+    "序号": "id",
+    "日期": "serve_date",
+    "内容": "content",
+    "姓名": "teacher_name",
+    "工作时长": "work_duration",
+    "课时": "class_hours",
+    "教师工号": "teacher_id",
+    "工作量": "workload",
+})